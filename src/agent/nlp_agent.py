@@ -9,12 +9,72 @@ except ImportError:
 from langchain_community.utilities import SQLDatabase
 from langchain_experimental.sql import SQLDatabaseChain
 from langchain.prompts import PromptTemplate
+from sqlalchemy import create_engine, text
 import streamlit as st
-from typing import Dict, Any, Optional
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, Tuple
 
 import pandas as pd
-from src.utils.config import config
+from src.utils.config import config, MAX_PROCESSING_LOGS
 import re
+import threading
+import time
+
+# Regex constants (compiled once, reused by every agent instance)
+_MULTILINE_CODE_BLOCK_RE = re.compile(
+    r'^```\s*\n(.*?)\n```$', re.DOTALL | re.IGNORECASE
+)
+_INLINE_CODE_BLOCK_RE = re.compile(
+    r'^```(?:sql)?\s*\n?(.*?)\n?```$', re.DOTALL | re.IGNORECASE
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+_MISSING_OBJECT_RE = re.compile(r"Object '([^']+)' does not exist")
+
+# Only read-only statements whose result depends on the data alone are cached
+_CACHEABLE_SQL_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_NON_DETERMINISTIC_SQL_RE = re.compile(
+    r"\b(?:CURRENT_\w+|LOCALTIME|LOCALTIMESTAMP|SYSDATE|GETDATE|SYSTIMESTAMP"
+    r"|RANDOM|RANDSTR|UUID_STRING|SEQ[1248]|UNIFORM|NORMAL|ZIPF|NOW)\b",
+    re.IGNORECASE,
+)
+
+# Table listing requests answered directly from INFORMATION_SCHEMA
+_TABLE_LISTING_PHRASES = (
+    "show tables", "show me tables", "show all tables", "show me all tables",
+    "list tables", "list all tables", "what tables", "which tables",
+    "display tables", "get tables", "tables list"
+)
+_TABLE_LISTING_RE = re.compile(
+    "|".join(map(re.escape, _TABLE_LISTING_PHRASES)), re.IGNORECASE
+)
+
+
+class CachedSchemaSQLDatabase(SQLDatabase):
+    """SQLDatabase that reuses its table descriptions between queries.
+
+    SQLDatabaseChain asks for the table info on every question, which means
+    sample-row queries against each table. The description is kept per
+    requested table set for a short TTL instead.
+    """
+
+    table_info_ttl = 300  # Cache TTL: 5 minutes
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._table_info_cache = {}
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        """Return the table descriptions, rebuilt at most once per TTL."""
+        key = tuple(table_names) if table_names else None
+        current_time = time.time()
+
+        cached = self._table_info_cache.get(key)
+        if cached is not None and (current_time - cached[0]) < self.table_info_ttl:
+            return cached[1]
+
+        table_info = super().get_table_info(table_names)
+        self._table_info_cache[key] = (current_time, table_info)
+        return table_info
 
 
 class SnowflakeNLPAgent:
@@ -31,6 +91,11 @@ class SnowflakeNLPAgent:
     - Log process steps for UI visibility
     """
 
+    query_result_ttl = config.QUERY_RESULT_TTL  # Cache TTL (default 5 minutes)
+    query_result_max_entries = 64
+    query_result_max_rows = 10_000  # Larger results are never cached
+    query_result_max_total_rows = 100_000  # Rows kept across all entries
+
     def __init__(self, db_connection: str, groq_api_key: Optional[str] = None, google_api_key: Optional[str] = None):
         # Select available LLM provider
         provider = config.get_available_llm_provider()
@@ -75,7 +140,14 @@ class SnowflakeNLPAgent:
         else:
             raise RuntimeError("No LLM provider available. Configure GOOGLE_API_KEY, GROQ_API_KEY or OLLAMA_BASE_URL.")
 
-        self.db = SQLDatabase.from_uri(db_connection)
+        self.engine = create_engine(db_connection)
+        self.db = CachedSchemaSQLDatabase(self.engine)
+
+        # Rows of recently executed SQL, keyed on the statement. The agent is
+        # shared by every session, so access goes through a lock.
+        self._query_results = OrderedDict()
+        self._query_result_rows = 0  # Total rows held in _query_results
+        self._query_results_lock = threading.Lock()
 
         # Create custom prompt that explicitly uses real table names
         # First, let's discover what tables actually exist
@@ -140,21 +212,17 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         if not isinstance(sql_text, str):
             return ""
         
-        import re
-        
         # Remove leading and trailing spaces
         cleaned = sql_text.strip()
         
         # STEP 1: Remove multiline markdown code blocks
         # Pattern for ```\nSELECT...\n```
-        multiline_pattern = r'^```\s*\n(.*?)\n```$'
-        match = re.search(multiline_pattern, cleaned, re.DOTALL | re.IGNORECASE)
+        match = _MULTILINE_CODE_BLOCK_RE.search(cleaned)
         if match:
             cleaned = match.group(1).strip()
         else:
             # STEP 2: Remove inline code blocks ```sql...```
-            inline_pattern = r'^```(?:sql)?\s*\n?(.*?)\n?```$'
-            match = re.search(inline_pattern, cleaned, re.DOTALL | re.IGNORECASE)
+            match = _INLINE_CODE_BLOCK_RE.search(cleaned)
             if match:
                 cleaned = match.group(1).strip()
         
@@ -185,7 +253,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         result = ' '.join(sql_lines).strip()  # Use space instead of \n for one line
         
         # STEP 7: Clean multiple spaces
-        result = re.sub(r'\s+', ' ', result)
+        result = _WHITESPACE_RE.sub(' ', result)
         
         return result
     
@@ -195,16 +263,8 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         
         Returns None if not a metadata query, or result dict if handled.
         """
-        user_lower = user_question.lower().strip()
-        
-        # Check for table listing queries
-        table_queries = [
-            "show tables", "show me tables", "show all tables", "show me all tables",
-            "list tables", "list all tables", "what tables", "which tables",
-            "display tables", "get tables", "tables list"
-        ]
-        
-        if any(query in user_lower for query in table_queries):
+        # Check for table listing queries (one scan for all phrases)
+        if _TABLE_LISTING_RE.search(user_question):
             try:
                 self.log_step("🏷️ Metadata Query Detected", "Handling table list directly")
                 
@@ -212,12 +272,13 @@ Generate PURE SQL using ONLY the real table names from the schema."""
                 clean_sql = "SELECT TABLE_NAME, TABLE_TYPE FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = CURRENT_SCHEMA() ORDER BY TABLE_NAME"
                 self.log_step("📝 Direct SQL", clean_sql)
                 
-                result = self.db.run(clean_sql)
+                result, columns = self._fetch_rows(clean_sql)
                 self.log_step("✅ Tables retrieved", f"{len(result) if result else 0} tables found")
                 
                 return {
                     "success": True,
                     "result": result,
+                    "columns": columns,
                     "sql_query": clean_sql,
                     "query_type": "metadata",
                     "direct_handling": True
@@ -233,9 +294,91 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         
         return None  # Not a metadata query
     
-    def process_query(self, user_question: str) -> Dict[str, Any]:
+    def _fetch_rows(self, sql: str) -> Tuple[List[tuple], List[str]]:
+        """Execute SQL and return the driver rows (as tuples) and column names.
+
+        SQLDatabase.run() returns str(rows), which the UI would then have to
+        parse back; reading the rows directly keeps Decimal/date values typed,
+        and the cursor's column names spare the UI from guessing them.
+
+        Results of deterministic SELECTs are reused for query_result_ttl
+        seconds when the same SQL runs again (the LLM often generates
+        identical SQL for re-asked questions), keeping the last
+        query_result_max_entries statements and at most
+        query_result_max_total_rows rows; results over query_result_max_rows
+        are not kept. Rows may therefore be up to query_result_ttl seconds
+        old; clear_result_cache() drops them.
+        """
+        if not self._is_cacheable_sql(sql):
+            return self._execute_sql(sql)
+
+        current_time = time.time()
+        with self._query_results_lock:
+            cached = self._query_results.get(sql)
+            is_fresh = (
+                cached is not None
+                and (current_time - cached[0]) < self.query_result_ttl
+            )
+            if is_fresh:
+                self._query_results.move_to_end(sql)
+        if is_fresh:
+            self.log_step("💾 Cache Hit", "Reusing rows of an identical recent query")
+            return list(cached[1]), list(cached[2])
+
+        rows, columns = self._execute_sql(sql)
+        if len(rows) > self.query_result_max_rows:
+            return rows, columns
+
+        with self._query_results_lock:
+            previous = self._query_results.pop(sql, None)
+            if previous is not None:
+                self._query_result_rows -= len(previous[1])
+            self._query_results[sql] = (current_time, rows, columns)
+            self._query_result_rows += len(rows)
+            while (
+                len(self._query_results) > self.query_result_max_entries
+                or self._query_result_rows > self.query_result_max_total_rows
+            ):
+                _, evicted = self._query_results.popitem(last=False)
+                self._query_result_rows -= len(evicted[1])
+        return list(rows), list(columns)
+
+    def _is_cacheable_sql(self, sql: str) -> bool:
+        """Whether the rows of sql can be reused (deterministic SELECT only)."""
+        return (
+            self.query_result_ttl > 0
+            and _CACHEABLE_SQL_RE.match(sql) is not None
+            and _NON_DETERMINISTIC_SQL_RE.search(sql) is None
+        )
+
+    def clear_result_cache(self) -> None:
+        """Drop the cached rows so the next queries read fresh data."""
+        with self._query_results_lock:
+            self._query_results.clear()
+            self._query_result_rows = 0
+
+    def _execute_sql(self, sql: str) -> Tuple[List[tuple], List[str]]:
+        """Run SQL against the engine; returns (rows, column names)."""
+        with self.engine.begin() as connection:
+            cursor = connection.execute(text(sql))
+            if not cursor.returns_rows:
+                return [], []
+            columns = list(cursor.keys())
+            return [tuple(row) for row in cursor.fetchall()], columns
+
+    def process_query(
+        self,
+        user_question: Optional[str] = None,
+        *,
+        sql_override: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """Process user query and return data ready for the UI.
 
+        When sql_override is given, that SQL is executed directly (no
+        metadata handling, no LLM) through the same execution and
+        error-handling path, e.g. to test the user-friendly errors. Passing
+        neither a question nor sql_override raises ValueError.
+
         Flow:
         1) Check if it's a metadata query (handle directly)
         2) Invoke SQL chain to get SQL from natural language
@@ -244,7 +387,13 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         5) Execute SQL directly against Snowflake (via SQLDatabase)
         6) Log each step for traceability in Streamlit
         """
+        if user_question is None and sql_override is None:
+            raise ValueError("process_query needs a user_question or sql_override")
+
         try:
+            if sql_override is not None:
+                return self._execute_sql_override(sql_override)
+
             # Log processing start
             self.log_step("🔍 Processing query", user_question)
             
@@ -281,6 +430,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
 
             # If we have clear SQL, execute it directly to get real data
             actual_result = None
+            columns = None
             if isinstance(sql_query, str):
                 # Normalize SQL (remove possible backticks/markdown) - Enhanced for CodeLlama
                 cleaned_sql = self.clean_sql_response(sql_query)
@@ -292,7 +442,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
                         
                         # Execute the SQL directly against Snowflake
                         self.log_step("🚀 Executing SQL", cleaned_sql)
-                        actual_result = self.db.run(cleaned_sql)
+                        actual_result, columns = self._fetch_rows(cleaned_sql)
                         self.log_step(
                             "✅ Results obtained",
                             f"{len(actual_result) if hasattr(actual_result, '__len__') else 'N/A'} rows",  # noqa: E501
@@ -353,7 +503,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
                             self.log_step(
                                 "🚀 Executing LLM response as SQL", cleaned_final
                             )
-                            actual_result = self.db.run(cleaned_final)
+                            actual_result, columns = self._fetch_rows(cleaned_final)
                         except Exception as e:
                             self.log_step(
                                 "⚠️ Error executing LLM response", f"Error: {str(e)}"
@@ -387,6 +537,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
             return {
                 "success": True,
                 "result": actual_result,
+                "columns": columns,
                 "sql_query": final_sql_query,
                 "intermediate_steps": result.get("intermediate_steps", []),
             }
@@ -404,6 +555,24 @@ Generate PURE SQL using ONLY the real table names from the schema."""
             
             return error_context
 
+    def _execute_sql_override(self, sql: str) -> Dict[str, Any]:
+        """Execute caller-provided SQL, bypassing the NL→SQL chain."""
+        cleaned_sql = self.clean_sql_response(sql)
+        self.log_step("🚀 Executing SQL", cleaned_sql)
+        try:
+            rows, columns = self._fetch_rows(cleaned_sql)
+        except Exception as e:
+            self.log_step("⚠️ Error executing SQL", f"Error: {str(e)}")
+            return self._handle_sql_error(e, cleaned_sql)
+
+        self.log_step("✅ Results obtained", f"{len(rows)} rows")
+        return {
+            "success": True,
+            "result": rows,
+            "columns": columns,
+            "sql_query": cleaned_sql,
+        }
+
     def _handle_sql_error(self, error: Exception, sql_query: str = None) -> Dict[str, Any]:
         """Handle SQL execution errors with user-friendly messages.
         
@@ -419,8 +588,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
         # Common error patterns and user-friendly messages
         if "does not exist" in error_str or "not authorized" in error_str:
             # Extract table name from error if possible
-            import re
-            table_match = re.search(r"Object '([^']+)' does not exist", error_str)
+            table_match = _MISSING_OBJECT_RE.search(error_str)
             if table_match:
                 table_name = table_match.group(1).lower()
                 user_message = f"❌ The table '{table_name}' doesn't exist in your database or you don't have permission to access it."
@@ -453,7 +621,7 @@ Generate PURE SQL using ONLY the real table names from the schema."""
     def log_step(self, step_name: str, content: str):
         """Log processing steps in Streamlit"""
         if "processing_logs" not in st.session_state:
-            st.session_state.processing_logs = []
+            st.session_state.processing_logs = deque(maxlen=MAX_PROCESSING_LOGS)
 
         log_entry = {
             "step": step_name,
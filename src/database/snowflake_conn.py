@@ -9,6 +9,7 @@ from sqlalchemy.pool import NullPool
 from typing import Optional, Dict, Any
 import streamlit as st
 import logging
+import time
 
 from src.utils.config import config
 from src.utils.helpers import log_manager, error_handler
@@ -219,7 +220,6 @@ class SnowflakeConnection:
             return {"error": "Not connected to Snowflake"}
         
         # Check cache validity
-        import time
         current_time = time.time()
         
         if (self._context_cache is not None and 
@@ -10,6 +10,9 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Number of processing logs kept for the logs panel (UI and agent share it)
+MAX_PROCESSING_LOGS = 10
+
 
 class Config:
     """Class to handle application configuration"""
@@ -41,6 +44,8 @@ class Config:
 
         # App
         self.DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+        # Seconds the agent reuses rows of an identical SELECT (0 disables it)
+        self.QUERY_RESULT_TTL = int(os.getenv("QUERY_RESULT_TTL", "300"))
     
     def is_ollama_available(self) -> bool:
         """Check if Ollama is available and accessible"""
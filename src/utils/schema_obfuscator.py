@@ -7,11 +7,51 @@ while maintaining semantic meaning for better LLM understanding.
 
 import re
 import logging
+import functools
 from typing import Dict, List, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
 
+def _build_real_sql_replacements(reverse_tables: Dict[str, str],
+                                 reverse_columns: Dict[str, str]) -> Tuple:
+    """
+    Build the ordered (pattern, old, new) steps of translate_to_real_sql.
+
+    Steps with a compiled pattern are regex substitutions; the others are
+    plain str.replace calls of old by new. Built once when the class loads.
+    """
+    steps = []
+
+    # Table names (longer names first to avoid partial matches), uppercase for Snowflake
+    for obfuscated_table, real_table in sorted(reverse_tables.items(),
+                                               key=lambda x: len(x[0]), reverse=True):
+        pattern = re.compile(r'\b' + re.escape(obfuscated_table) + r'\b', re.IGNORECASE)
+        steps.append((pattern, None, real_table.upper()))
+
+    # Column references (table.column format)
+    for obfuscated_col, real_col in sorted(reverse_columns.items(),
+                                           key=lambda x: len(x[0]), reverse=True):
+        # Create uppercase version for Snowflake compatibility
+        if '.' in real_col:
+            table_part, col_part = real_col.split('.', 1)
+            real_col_upper = f"{table_part.upper()}.{col_part.upper()}"
+        else:
+            real_col_upper = real_col.upper()
+
+        # Direct replacement for qualified column names
+        steps.append((None, obfuscated_col, real_col_upper))
+
+        # Also handle unqualified column names by extracting just the column part
+        if '.' in obfuscated_col:
+            obf_col_name = obfuscated_col.split('.')[1]
+            real_col_name = real_col.split('.')[1].upper()  # Uppercase column name
+            pattern = re.compile(r'\b' + re.escape(obf_col_name) + r'\b', re.IGNORECASE)
+            steps.append((pattern, None, real_col_name))
+
+    return tuple(steps)
+
+
 class SchemaObfuscator:
     """
     Hybrid schema obfuscation that maintains semantic meaning while hiding real names.
@@ -81,6 +121,10 @@ class SchemaObfuscator:
     # Create reverse mappings for translation back to real names
     REVERSE_TABLE_MAPPING = {v: k for k, v in TABLE_MAPPING.items()}
     REVERSE_COLUMN_MAPPING = {v: k for k, v in COLUMN_MAPPING.items()}
+
+    # Precompiled translation steps for translate_to_real_sql
+    REAL_SQL_REPLACEMENTS = _build_real_sql_replacements(REVERSE_TABLE_MAPPING,
+                                                         REVERSE_COLUMN_MAPPING)
     
     @classmethod
     def get_obfuscated_schema_info(cls) -> str:
@@ -138,41 +182,8 @@ commercial_events, property_holders) in your SQL response.
         if not obfuscated_sql:
             return obfuscated_sql
             
-        real_sql = obfuscated_sql
-        
         try:
-            # Replace table names (order matters - longer names first to avoid partial matches)
-            table_replacements = sorted(cls.REVERSE_TABLE_MAPPING.items(), 
-                                      key=lambda x: len(x[0]), reverse=True)
-            
-            for obfuscated_table, real_table in table_replacements:
-                # Replace table names with word boundaries - ensure uppercase for Snowflake
-                pattern = r'\b' + re.escape(obfuscated_table) + r'\b'
-                real_sql = re.sub(pattern, real_table.upper(), real_sql, flags=re.IGNORECASE)
-            
-            # Replace column references (table.column format)
-            column_replacements = sorted(cls.REVERSE_COLUMN_MAPPING.items(),
-                                       key=lambda x: len(x[0]), reverse=True)
-            
-            for obfuscated_col, real_col in column_replacements:
-                # Create uppercase version for Snowflake compatibility
-                if '.' in real_col:
-                    table_part, col_part = real_col.split('.', 1)
-                    real_col_upper = f"{table_part.upper()}.{col_part.upper()}"
-                else:
-                    real_col_upper = real_col.upper()
-                
-                # Direct replacement for qualified column names
-                real_sql = real_sql.replace(obfuscated_col, real_col_upper)
-                
-                # Also handle unqualified column names by extracting just the column part
-                if '.' in obfuscated_col:
-                    obf_col_name = obfuscated_col.split('.')[1]
-                    real_col_name = real_col.split('.')[1].upper()  # Uppercase column name
-                    
-                    # Replace unqualified column names with word boundaries
-                    pattern = r'\b' + re.escape(obf_col_name) + r'\b'
-                    real_sql = re.sub(pattern, real_col_name, real_sql, flags=re.IGNORECASE)
+            real_sql = cls._translate_to_real_sql_cached(obfuscated_sql)
             
             logger.info(f"Translated obfuscated SQL to real SQL successfully")
             logger.debug(f"Obfuscated: {obfuscated_sql}")
@@ -185,6 +196,21 @@ commercial_events, property_holders) in your SQL response.
             # Return original if translation fails - better than breaking
             return obfuscated_sql
     
+    @classmethod
+    @functools.lru_cache(maxsize=256)
+    def _translate_to_real_sql_cached(cls, obfuscated_sql: str) -> str:
+        """
+        Apply REAL_SQL_REPLACEMENTS in order (memoized: agents tend to
+        generate the same SQL repeatedly).
+        """
+        real_sql = obfuscated_sql
+        for pattern, old, new in cls.REAL_SQL_REPLACEMENTS:
+            if pattern is not None:
+                real_sql = pattern.sub(new, real_sql)
+            else:
+                real_sql = real_sql.replace(old, new)
+        return real_sql
+    
     @classmethod
     def translate_to_obfuscated_sql(cls, real_sql: str) -> str:
         """
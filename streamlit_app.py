@@ -1,33 +1,129 @@
 import streamlit as st
 import pandas as pd
-from dotenv import load_dotenv
 import os
 import re
 import ast
+import bisect
+import itertools
+import json
+import time
+import types
+import uuid
+from collections import OrderedDict, deque
+from decimal import Decimal
 from src.agent.nlp_agent import SnowflakeNLPAgent
 from src.database.snowflake_conn import SnowflakeConnection
+# Importing config loads .env once per process; this script itself is
+# re-executed on every rerun, so it doesn't call load_dotenv() again
+from src.utils.config import config, MAX_PROCESSING_LOGS
 
 # Regex constants
-DECIMAL_REGEX = r"Decimal\('([^']+)'\)"
-
-# Load environment variables
-load_dotenv()
+_NONE_RE = re.compile(r"\bNone\b")
+# Driver literals ast.literal_eval can't read, rewritten in a single pass
+_DRIVER_LITERAL_RE = re.compile(
+    r"datetime\.date\((?P<year>\d+),\s*(?P<month>\d+),\s*(?P<day>\d+)\)"
+    r"|datetime\.datetime\((?P<datetime>[^)]+)\)"
+    r"|Decimal\('(?P<decimal>[^']+)'\)"
+    r"|\bNone\b"
+)
+# Plain decimal numbers (no exponent) in display columns and fallback rows
+_PLAIN_NUMBER_PATTERN = r"-?(?:\d+\.?\d*|\.\d+)"
+_PLAIN_NUMBER_RE = re.compile(_PLAIN_NUMBER_PATTERN)
+# Result strings holding only numbers, e.g. "[(1, 2.5), (3, -4)]"
+_NUMERIC_ROWS_RE = re.compile(r"[\d\s\[\](),.eE+-]*")
+_TUPLE_TO_JSON = str.maketrans("()", "[]")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?")
+_DATE_ARGS_RE = re.compile(r"(\d+),\s*(\d+),\s*(\d+)\)")
+
+# Cell types formatted as currency
+_NUMERIC_TYPES = (int, float, Decimal)
+
+# Number of chat messages kept in the history
+MAX_CHAT_MESSAGES = 200
+
+# Chat messages rendered at first; "Show older messages" reveals this many more
+CHAT_PAGE_MESSAGES = 20
+
+# Agent results reused for repeated prompts within a session (the TTL is
+# config.QUERY_RESULT_TTL, shared with the agent's result cache)
+QUERY_CACHE_MAX_ENTRIES = 64
+
+# Rows of a result table sent to the browser unless the user asks for all
+DATAFRAME_PAGE_ROWS = 500
+
+# Number of large results whose full DataFrame is kept for "Show all"
+MAX_STORED_RESULTS = 20
+
+# Cleaned result frames hold Arrow-backed strings (contiguous buffers instead
+# of one Python object per cell) when pyarrow is available; it ships with
+# Streamlit, so the plain string dtype is only a safety net
+try:
+    import pyarrow  # noqa: F401
+    _DISPLAY_STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    _DISPLAY_STRING_DTYPE = pd.StringDtype()
 
 
 # Page configuration
 st.set_page_config(page_title="Snowflake NLP Agent", page_icon="🤖", layout="wide")
 
 
+@st.cache_resource(show_spinner=False)
+def _get_db_connection():
+    """Open the Snowflake connection once per process and share it across reruns.
+
+    Returns None if the connection could not be established.
+    """
+    db_conn = SnowflakeConnection()
+    if db_conn.connect():
+        return db_conn
+    return None
+
+
+@st.cache_resource(show_spinner=False)
+def _get_agent(conn_str, groq_key, google_key):
+    """Build the NLP agent once per connection string and API keys.
+
+    LLM client setup and schema discovery are expensive, so the agent is
+    cached at process scope instead of being rebuilt for every new session.
+    """
+    return SnowflakeNLPAgent(
+        conn_str, groq_api_key=groq_key, google_api_key=google_key
+    )
+
+
 def initialize_session_state():
     """Initialize session state"""
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = deque(maxlen=MAX_CHAT_MESSAGES)
     if "processing_logs" not in st.session_state:
-        st.session_state.processing_logs = []
+        st.session_state.processing_logs = deque(maxlen=MAX_PROCESSING_LOGS)
     if "agent" not in st.session_state:
         st.session_state.agent = None
     if "db_connection" not in st.session_state:
         st.session_state.db_connection = None
+    if "db_context" not in st.session_state:
+        st.session_state.db_context = None
+    if "query_cache" not in st.session_state:
+        st.session_state.query_cache = OrderedDict()
+    if "result_cache" not in st.session_state:
+        st.session_state.result_cache = OrderedDict()
+    if "visible_msgs" not in st.session_state:
+        st.session_state.visible_msgs = CHAT_PAGE_MESSAGES
+
+
+def _get_session_db_context():
+    """Return the database context, fetched once per session.
+
+    Every widget interaction reruns the script, so the result is kept in
+    session_state; "Clear History" resets it to force a fresh fetch.
+    """
+    if st.session_state.db_context is None:
+        context = st.session_state.db_connection.get_database_context()
+        if "error" in context:
+            return context
+        st.session_state.db_context = context
+    return st.session_state.db_context
 
 
 def setup_sidebar():
@@ -44,7 +140,6 @@ def setup_sidebar():
     st.sidebar.header("📊 System Information")
     if st.session_state.agent:
         # Detect which LLM model is being used
-        from src.utils.config import config
         provider = config.get_available_llm_provider()
         
         if provider == "ollama":
@@ -64,7 +159,7 @@ def setup_sidebar():
         # Show dynamic database context instead of static environment vars
         if st.session_state.db_connection:
             try:
-                context = st.session_state.db_connection.get_database_context()
+                context = _get_session_db_context()
                 if "error" not in context:
                     st.sidebar.header("🗂️ Database Context")
                     st.sidebar.success(f"🏢 Database: **{context.get('database', 'N/A')}**")
@@ -83,14 +178,27 @@ def setup_sidebar():
             except Exception as e:
                 st.sidebar.error(f"❌ Context error: {str(e)[:50]}...")
         else:
-            # Fallback to environment variables
-            st.sidebar.info(f"Database: {os.getenv('SNOWFLAKE_DATABASE', 'Not set')}")
-            st.sidebar.info(f"Schema: {os.getenv('SNOWFLAKE_SCHEMA', 'Not set')}")
+            # Fallback to the configured values (read from the environment once)
+            st.sidebar.info(f"Database: {config.SNOWFLAKE_DATABASE or 'Not set'}")
+            st.sidebar.info(f"Schema: {config.SNOWFLAKE_SCHEMA or 'Not set'}")
+
+    # Query results are reused for a while, so the data shown can lag behind
+    if st.session_state.agent and config.QUERY_RESULT_TTL > 0:
+        st.sidebar.caption(
+            f"ℹ️ Query results may be cached for up to {config.QUERY_RESULT_TTL} s; "
+            "Clear History fetches fresh data."
+        )
 
     # Button to clear history
     if st.sidebar.button("🗑️ Clear History"):
-        st.session_state.messages = []
-        st.session_state.processing_logs = []
+        if st.session_state.agent:
+            st.session_state.agent.clear_result_cache()
+        st.session_state.messages = deque(maxlen=MAX_CHAT_MESSAGES)
+        st.session_state.processing_logs = deque(maxlen=MAX_PROCESSING_LOGS)
+        st.session_state.db_context = None
+        st.session_state.query_cache = OrderedDict()
+        st.session_state.result_cache = OrderedDict()
+        st.session_state.visible_msgs = CHAT_PAGE_MESSAGES
         st.rerun()
 
 
@@ -99,92 +207,156 @@ def setup_sidebar():
 # ========================
 
 
+# Keywords indicating database queries
+DB_KEYWORDS = (
+    "table", "data", "query", "how many", "show", "list", "display",
+    "region", "customer", "sale", "average", "sum", "total", "count",
+    "select", "database", "schema", "records", "rows", "columns",
+    "orders", "products", "categories", "revenue", "billing",
+    "analysis", "report", "statistics", "maximum", "minimum", "search",
+    "filter", "group", "sort", "top", "highest", "lowest", "latest", "recent",
+    # Additional keywords for complex queries
+    "city", "cities", "properties", "property", "price", "prices", "ranking",
+    "rank", "position", "positions", "each", "get", "obtain", "include", "only",
+    "dollars", "values", "value", "transactions", "transaction", "locations",
+    "location", "expensive", "more", "less", "most", "least",
+    "join", "inner", "left", "right", "where", "order by", "group by", "partition",
+    "over", "window", "function", "functions", "aggregate", "aggregation",
+    # Real estate specific vocabulary (based on SQL schema)
+    "agent", "agents", "owner", "owners", "buyer", "buyers", "seller", "sellers",
+    "sale", "sales", "purchase", "purchases", "listing", "listings",
+    "property", "properties", "house", "houses", "apartment", "apartments",
+    "lot", "lots",
+    "mortgage", "mortgages", "credit", "financing", "loan", "loans",
+    "bedrooms", "rooms", "bathrooms", "meters", "m2", "feet", "sqft",
+    "garage", "parking", "pool", "garden", "yard", "patio", "terrace",
+    "county", "state", "zip code", "zipcode", "msa", "zone", "neighborhood",
+    "appraisal", "valuation", "tax", "taxes", "commission", "commissions",
+    "listing", "listings", "offer", "offers", "closing", "closings", "deed",
+    "inspection", "evaluation", "market", "trend", "trends", "growth",
+    "profitability", "roi", "investment", "investments", "portfolio"
+)
+
+# Off-topic keywords (specific to avoid conflicts)
+OFF_TOPIC_KEYWORDS = (
+    "weather", "climate", "news", "recipe", "translate language", "how are you",
+    "hello",
+    "joke", "personal story", "movie", "music", "sport", "politics",
+    "personal health", "medicine", "travel", "restaurant", "buy clothes",
+    "personal schedule", "postal address", "personal phone", "personal email",
+    "schedule appointment"
+    # Removed "price" and "code" as they can be part of DB queries
+)
+
+# Help/information questions (special case)
+HELP_KEYWORDS = (
+    "help", "what can you do", "how does it work", "what do you do",
+    "what are you for", "how to use", "instructions", "commands",
+    "examples", "capabilities", "functions"
+)
+
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _keyword_pattern(keywords):
+    """Compile multi-word keywords into a single case-insensitive alternation."""
+    return re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE)
+
+
+def _split_keywords(keywords):
+    """Split keywords into a frozenset of single words and a phrase regex.
+
+    Single words are matched by set intersection against the prompt tokens;
+    only the few multi-word phrases ("how many", "order by", ...) need a scan.
+    """
+    words = frozenset(keyword for keyword in keywords if " " not in keyword)
+    phrases = [keyword for keyword in keywords if " " in keyword]
+    return words, _keyword_pattern(phrases) if phrases else None
+
+
+def _prompt_tokens(user_input):
+    """Lowercased prompt words, plus the singular form of words ending in 's'."""
+    words = _WORD_RE.findall(user_input.lower())
+    return set(words).union(word[:-1] for word in words if word.endswith("s"))
+
+
+def _has_keyword(tokens, user_input, words, phrases_re):
+    """Check a keyword group against the prompt tokens and phrases."""
+    if not tokens.isdisjoint(words):
+        return True
+    return phrases_re is not None and phrases_re.search(user_input) is not None
+
+
+_DB_WORDS, _DB_PHRASES_RE = _split_keywords(DB_KEYWORDS)
+_OFF_TOPIC_WORDS, _OFF_TOPIC_PHRASES_RE = _split_keywords(OFF_TOPIC_KEYWORDS)
+_HELP_WORDS, _HELP_PHRASES_RE = _split_keywords(HELP_KEYWORDS)
+
+# Words that keep a prompt on the database path even when it also mentions
+# an off-topic keyword ("sales in the travel market", "weather data table")
+_DATA_CONTEXT_WORDS = frozenset((
+    "table", "data", "query", "database", "record", "row", "column",
+    "price", "sale", "property", "agent", "transaction",
+))
+
+# Phrasings typical of data requests, matched anywhere in long prompts
+_DATA_STRUCTURE_RE = _keyword_pattern((
+    "for each", "get", "obtain", "show", "list", "find",
+    "calculate", "sum", "count", "group by", "order by",
+    "with price", "with value", "greater than", "less than", "equal to",
+    "include", "exclude", "only", "just", "uniquely",
+))
+
+
 def is_database_query(user_input):
-    """Detects if the query is about databases or out of context"""
-    user_input_lower = user_input.lower()
-    
-    # Keywords indicating database queries
-    db_keywords = [
-        "table", "data", "query", "how many", "show", "list", "display",
-        "region", "customer", "sale", "average", "sum", "total", "count",
-        "select", "database", "schema", "records", "rows", "columns",
-        "orders", "products", "categories", "revenue", "billing",
-        "analysis", "report", "statistics", "maximum", "minimum", "search",
-        "filter", "group", "sort", "top", "highest", "lowest", "latest", "recent",
-        # Additional keywords for complex queries
-        "city", "cities", "properties", "property", "price", "prices", "ranking",
-        "rank", "position", "positions", "each", "get", "obtain", "include", "only",
-        "dollars", "values", "value", "transactions", "transaction", "locations",
-        "location", "expensive", "more", "less", "most", "least",
-        "join", "inner", "left", "right", "where", "order by", "group by", "partition",
-        "over", "window", "function", "functions", "aggregate", "aggregation",
-        # Real estate specific vocabulary (based on SQL schema)
-        "agent", "agents", "owner", "owners", "buyer", "buyers", "seller", "sellers",
-        "sale", "sales", "purchase", "purchases", "listing", "listings",
-        "property", "properties", "house", "houses", "apartment", "apartments", "lot", "lots",
-        "mortgage", "mortgages", "credit", "financing", "loan", "loans",
-        "bedrooms", "rooms", "bathrooms", "meters", "m2", "feet", "sqft",
-        "garage", "parking", "pool", "garden", "yard", "patio", "terrace",
-        "county", "state", "zip code", "zipcode", "msa", "zone", "neighborhood",
-        "appraisal", "valuation", "tax", "taxes", "commission", "commissions",
-        "listing", "listings", "offer", "offers", "closing", "closings", "deed",
-        "inspection", "evaluation", "market", "trend", "trends", "growth",
-        "profitability", "roi", "investment", "investments", "portfolio"
-    ]
-    
-    # Off-topic keywords (specific to avoid conflicts)
-    off_topic_keywords = [
-        "weather", "climate", "news", "recipe", "translate language", "how are you", "hello",
-        "joke", "personal story", "movie", "music", "sport", "politics",
-        "personal health", "medicine", "travel", "restaurant", "buy clothes",
-        "personal schedule", "postal address", "personal phone", "personal email", "schedule appointment"
-        # Removed "price" and "code" as they can be part of DB queries
-    ]
-    
-    # Help/information questions (special case)
-    help_keywords = [
-        "help", "what can you do", "how does it work", "what do you do",
-        "what are you for", "how to use", "instructions", "commands",
-        "examples", "capabilities", "functions"
-    ]
-    
+    """Detects if the query is about databases or out of context
+
+    Classification ignores case and surrounding whitespace.
+    """
+    return _classify_prompt(user_input.strip().lower())
+
+
+def _classify_prompt(user_input):
+    """Body of is_database_query (expects a normalized prompt)."""
+    tokens = _prompt_tokens(user_input)
+    # Empty or punctuation-only input: nothing to match against
+    if not tokens:
+        return "unclear"
+
     # Verificar si es pregunta de ayuda
-    if any(keyword in user_input_lower for keyword in help_keywords):
+    if _has_keyword(tokens, user_input, _HELP_WORDS, _HELP_PHRASES_RE):
         return "help"
     
-    # Verificar si contiene palabras claramente fuera de contexto
-    if any(keyword in user_input_lower for keyword in off_topic_keywords):
+    # Verificar si contiene palabras claramente fuera de contexto, salvo que
+    # el prompt también hable explícitamente de datos
+    if _has_keyword(
+        tokens, user_input, _OFF_TOPIC_WORDS, _OFF_TOPIC_PHRASES_RE
+    ) and tokens.isdisjoint(_DATA_CONTEXT_WORDS):
         return "off_topic"
     
     # Verificar si contiene palabras clave de BD
-    if any(keyword in user_input_lower for keyword in db_keywords):
+    if _has_keyword(tokens, user_input, _DB_WORDS, _DB_PHRASES_RE):
         return "database"
     
     # If not clear, analyze more deeply
-    if len(user_input.split()) < 3:  # Very short, probably not a DB query
+    word_count = len(user_input.split())
+    if word_count < 3:  # Very short, probably not a DB query
         return "unclear"
     
     # For long queries (>10 words), probably complex DB queries
-    if len(user_input.split()) > 10:
+    if word_count > 10:
         # Check if it has data query structure
-        data_structure_indicators = [
-            "for each", "get", "obtain", "show", "list", "find",
-            "calculate", "sum", "count", "group by", "order by",
-            "with price", "with value", "greater than", "less than", "equal to",
-            "include", "exclude", "only", "just", "uniquely"
-        ]
-        
-        if any(indicator in user_input_lower for indicator in data_structure_indicators):
+        if _DATA_STRUCTURE_RE.search(user_input):
             return "database"
     
     return "database"  # By default, try as database query
 
 
-def get_help_response():
-    """Returns educational response about system capabilities"""
-    return {
-        "type": "help",
-        "message": """Hello! 👋 I'm your NLP assistant for real estate queries in Snowflake.
+# Canned replies for non-database prompts, built once at import and shared
+# between calls as read-only mappings
+_HELP_RESPONSE = types.MappingProxyType({
+    "type": "help",
+    "message": """Hello! 👋 I'm your NLP assistant for real estate queries in Snowflake.
 
 🔍 **I can help you with:**
 • 🏠 **Properties:** "How many properties are there per city?"
@@ -203,14 +375,11 @@ def get_help_response():
 • "How many transactions were made last month?"
 
 Ask me any question about real estate! 🏡🚀"""
-    }
+})
 
-
-def get_redirect_response():
-    """Returns redirect response for out-of-context queries"""
-    return {
-        "type": "redirect",
-        "message": """🤖 I'm an assistant specialized in Snowflake database queries.
+_REDIRECT_RESPONSE = types.MappingProxyType({
+    "type": "redirect",
+    "message": """🤖 I'm an assistant specialized in Snowflake database queries.
 
 I can't help you with that query, but I can help you explore your data! 📋
 
@@ -220,7 +389,17 @@ I can't help you with that query, but I can help you explore your data! 📋
 • "What tables are available?"
 
 Is there any information from your database you'd like to know? 😊"""
-    }
+})
+
+
+def get_help_response():
+    """Returns educational response about system capabilities"""
+    return _HELP_RESPONSE
+
+
+def get_redirect_response():
+    """Returns redirect response for out-of-context queries"""
+    return _REDIRECT_RESPONSE
 
 
 # ========================
@@ -229,60 +408,262 @@ Is there any information from your database you'd like to know? 😊"""
 
 
 def parse_sql_result_string(result_string):
-    """Parse a string with SQL results and convert it to real data"""
+    """Parse a string with SQL results and convert it to real data.
+
+    Parsed rows are returned as a list of tuples. Repeated results are not
+    re-parsed: the only caller, format_sql_result_to_dataframe, is itself
+    memoized with st.cache_data.
+    """
 
     # If it's not a string or doesn't have expected format, return as is
     if not isinstance(result_string, str) or not result_string.strip():
         return result_string
 
+    return _parse_result_text(result_string)
+
+
+def _to_number(token):
+    """Convert a numeric literal to int, or float when it has a fraction/exponent."""
+    if "." in token or "e" in token or "E" in token:
+        return float(token)
+    return int(token)
+
+
+def _scan_literal(text, pos):
+    """Read one driver literal starting at text[pos].
+
+    Returns (value, next_pos) using the same conversions as the regex +
+    ast.literal_eval path: Decimal -> number, None -> 'None', dates ->
+    'Y-M-D' and datetimes -> 'datetime(...)'. Raises ValueError otherwise.
+    """
+    char = text[pos]
+    if char in "'\"":
+        end = pos
+        while True:
+            end = text.index(char, end + 1)
+            backslashes = 0
+            while text[end - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                break
+        token = text[pos:end + 1]
+        value = ast.literal_eval(token) if "\\" in token else token[1:-1]
+        return value, end + 1
+    if char == "-" or char.isdigit():
+        match = _NUMBER_RE.match(text, pos)
+        if match is None:
+            raise ValueError(f"Invalid number at position {pos}")
+        return _to_number(match.group()), match.end()
+    if text.startswith("None", pos):
+        return "None", pos + 4
+    if text.startswith("True", pos):
+        return True, pos + 4
+    if text.startswith("False", pos):
+        return False, pos + 5
+    if text.startswith("Decimal('", pos):
+        end = text.index("')", pos)
+        inner = text[pos + 9:end]
+        if not _NUMBER_RE.fullmatch(inner):
+            raise ValueError(f"Unsupported Decimal value: {inner}")
+        return _to_number(inner), end + 2
+    if text.startswith("datetime.date(", pos):
+        match = _DATE_ARGS_RE.match(text, pos + 14)
+        if match is None:
+            raise ValueError(f"Invalid date at position {pos}")
+        return "{}-{}-{}".format(*match.groups()), match.end()
+    if text.startswith("datetime.datetime(", pos):
+        end = text.index(")", pos)
+        return f"datetime({text[pos + 18:end]})", end + 1
+    raise ValueError(f"Unsupported literal at position {pos}")
+
+
+def _parse_numeric_rows_json(text):
+    """Parse a numbers-only "[(1, 2.5), ...]" payload with json.loads.
+
+    json runs in C and is much faster than the Python scanner for large
+    numeric results. Returns None when the text isn't a flat list of tuples.
+    """
+    try:
+        rows = json.loads(text.replace(",)", ")").translate(_TUPLE_TO_JSON))
+    except ValueError:
+        return None
+    for row in rows:
+        if not isinstance(row, list) or any(isinstance(value, list) for value in row):
+            return None
+    return [tuple(row) for row in rows]
+
+
+def _fast_parse_rows(text):
+    """Parse the repr of a list of tuples in a single left-to-right pass.
+
+    Avoids building a Python AST for the whole payload. Anything outside the
+    literals the Snowflake driver emits raises ValueError so the caller can
+    fall back to ast.literal_eval.
+    """
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+
+    rows = []
+    row = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char in " ,\n\t":
+            pos += 1
+        elif row is None:
+            if char != "(":
+                raise ValueError(f"Expected a tuple at position {pos}")
+            row = []
+            pos += 1
+        elif char == ")":
+            rows.append(tuple(row))
+            row = None
+            pos += 1
+        else:
+            value, pos = _scan_literal(text, pos)
+            row.append(value)
+            while pos < length and text[pos] == " ":
+                pos += 1
+            if pos < length and text[pos] not in ",)":
+                raise ValueError(f"Expected ',' or ')' at position {pos}")
+
+    if row is not None:
+        raise ValueError("Unterminated tuple")
+    return rows
+
+
+def _split_fallback_tuples(text, quote_aware=True):
+    """Split "(...), (...)" text into lists of raw element strings.
+
+    Parentheses are depth-tracked, so nested calls like f(g(2)) stay in one
+    element. With quote_aware, a quote opening an element starts a string
+    whose commas and parentheses are literal; returns None if such a
+    string is never closed. Text outside the tuples is ignored.
+    """
+    tuples = []
+    current_tuple = []
+    current_element = ""
+    paren_depth = 0
+    quote = None
+    escaped = False
+
+    for char in text:
+        if quote is not None:
+            current_element += char
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char == "(":
+            if paren_depth == 0:
+                # Start of new tuple
+                current_tuple = []
+                current_element = ""
+            else:
+                current_element += char
+            paren_depth += 1
+        elif char == ")" and paren_depth > 0:
+            paren_depth -= 1
+            if paren_depth == 0:
+                # End of current tuple
+                if current_element.strip():
+                    current_tuple.append(current_element.strip())
+                if current_tuple:
+                    tuples.append(current_tuple)
+                current_element = ""
+            else:
+                current_element += char
+        elif char == "," and paren_depth == 1:
+            # Element separator within tuple
+            if current_element.strip():
+                current_tuple.append(current_element.strip())
+            current_element = ""
+        elif paren_depth > 0:
+            if quote_aware and char in "'\"" and not current_element.strip():
+                quote = char
+            current_element += char
+
+    if quote is not None:
+        return None
+    return tuples
+
+
+def _replace_driver_literal(match):
+    """Rewrite one _DRIVER_LITERAL_RE match into a literal_eval-friendly form.
+
+    Dates become 'Y-M-D', datetimes 'datetime(...)', Decimal('x') the bare
+    number and None the string 'None'.
+    """
+    if match.group("year") is not None:
+        return "'{}-{}-{}'".format(match["year"], match["month"], match["day"])
+    if match.group("datetime") is not None:
+        return f"'datetime({match['datetime']})'"
+    if match.group("decimal") is not None:
+        return _NONE_RE.sub("'None'", match["decimal"])
+    return "'None'"
+
+
+def _parse_result_text(result_string):
+    """Body of parse_sql_result_string (expects a non-empty string)."""
+
     # Clean input string
     cleaned_string = result_string.strip()
 
+    # Quick reject: nothing below can parse a string without these markers
+    if (
+        not cleaned_string.startswith(("[", "("))
+        and "Decimal(" not in cleaned_string
+        and "None" not in cleaned_string
+        and "datetime" not in cleaned_string
+    ):
+        return result_string
+
+    # Numbers-only lists of tuples are valid JSON once the brackets are swapped
+    if (
+        cleaned_string.startswith(("[(", "[]"))
+        and _NUMERIC_ROWS_RE.fullmatch(cleaned_string)
+    ):
+        rows = _parse_numeric_rows_json(cleaned_string)
+        if rows is not None:
+            return rows
+
+    # Fast path: scan "[(...), ...]" and "(...)" payloads directly
+    if cleaned_string.startswith(("[", "(")) and cleaned_string.endswith(("]", ")")):
+        try:
+            return _fast_parse_rows(cleaned_string)
+        except (ValueError, SyntaxError):
+            pass  # Fall back to the regex + ast.literal_eval path below
+
     try:
-        # First, handle datetime objects in string representation
-        # Replace datetime.date(YYYY, M, D) with a simple string representation
-        datetime_pattern = r"datetime\.date\((\d+),\s*(\d+),\s*(\d+)\)"
-        cleaned_string = re.sub(datetime_pattern, r"'\1-\2-\3'", cleaned_string)
-        
-        # Replace datetime.datetime patterns too
-        datetime_full_pattern = r"datetime\.datetime\(([^)]+)\)"
-        def datetime_replacer(match):
-            # Convert datetime components to a simple string
-            components = match.group(1)
-            return f"'datetime({components})'"
-        cleaned_string = re.sub(datetime_full_pattern, datetime_replacer, cleaned_string)
+        has_decimal = "Decimal(" in cleaned_string
+        # Rewrite dates, datetimes, Decimal and None into plain literals; the
+        # substring checks skip the regex pass when none of them is present
+        if has_decimal or "None" in cleaned_string or "datetime" in cleaned_string:
+            cleaned_string = _DRIVER_LITERAL_RE.sub(
+                _replace_driver_literal, cleaned_string
+            )
 
         # Case 1: List of tuples [(...), (...)]
         if cleaned_string.startswith("[") and cleaned_string.endswith("]"):
-            # Replace Decimal('...') with float
-            cleaned_string = re.sub(DECIMAL_REGEX, r"\1", cleaned_string)
-            # Replace None with 'None' for safe evaluation
-            cleaned_string = re.sub(r"\bNone\b", "'None'", cleaned_string)
-
-            # Try to evaluate as Python literal
             parsed_data = ast.literal_eval(cleaned_string)
             return parsed_data
 
         # Case 2: Simple tuple (...)
         elif cleaned_string.startswith("(") and cleaned_string.endswith(")"):
             # Convert simple tuple to list of tuples
-            cleaned_string = f"[{cleaned_string}]"
-            cleaned_string = re.sub(DECIMAL_REGEX, r"\1", cleaned_string)
-            cleaned_string = re.sub(r"\bNone\b", "'None'", cleaned_string)
-
-            parsed_data = ast.literal_eval(cleaned_string)
+            parsed_data = ast.literal_eval(f"[{cleaned_string}]")
             return parsed_data
 
         # Case 3: String that seems to be data but not well formatted
-        elif "Decimal(" in cleaned_string or "None" in cleaned_string or "datetime" in cleaned_string:
+        elif has_decimal or "None" in cleaned_string or "datetime" in cleaned_string:
             # Try to fix the format
             if not cleaned_string.startswith("["):
-                cleaned_string = f"[{cleaned_string}]"
-
-            cleaned_string = re.sub(DECIMAL_REGEX, r"\1", cleaned_string)
-            cleaned_string = re.sub(r"\bNone\b", "'None'", cleaned_string)
-
-            parsed_data = ast.literal_eval(cleaned_string)
+                parsed_data = ast.literal_eval(f"[{cleaned_string}]")
+            else:
+                parsed_data = ast.literal_eval(cleaned_string)
             return parsed_data
 
     except (ValueError, SyntaxError, TypeError):
@@ -299,49 +680,12 @@ def parse_sql_result_string(result_string):
             if work_string.startswith("[") and work_string.endswith("]"):
                 work_string = work_string[1:-1]
             
-            # Split by tuple boundaries - this is tricky because tuples can contain commas
-            # Use a more sophisticated approach
-            tuples = []
-            current_tuple = []
-            paren_depth = 0
-            current_element = ""
-            i = 0
-            
-            while i < len(work_string):
-                char = work_string[i]
-                
-                if char == '(' and paren_depth == 0:
-                    # Start of new tuple
-                    if current_tuple:
-                        tuples.append(current_tuple)
-                        current_tuple = []
-                    paren_depth = 1
-                    current_element = ""
-                elif char == ')' and paren_depth == 1:
-                    # End of current tuple
-                    if current_element.strip():
-                        current_tuple.append(current_element.strip())
-                    if current_tuple:
-                        tuples.append(current_tuple)
-                    current_tuple = []
-                    paren_depth = 0
-                    current_element = ""
-                elif char == '(' and paren_depth > 0:
-                    paren_depth += 1
-                    current_element += char
-                elif char == ')' and paren_depth > 1:
-                    paren_depth -= 1
-                    current_element += char
-                elif char == ',' and paren_depth == 1:
-                    # Element separator within tuple
-                    if current_element.strip():
-                        current_tuple.append(current_element.strip())
-                    current_element = ""
-                elif paren_depth > 0:
-                    current_element += char
-                
-                i += 1
-            
+            # Split by tuple boundaries, tracking parenthesis depth; retry
+            # without quote handling if a quote is never closed
+            tuples = _split_fallback_tuples(work_string)
+            if tuples is None:
+                tuples = _split_fallback_tuples(work_string, quote_aware=False)
+
             # Convert string elements to appropriate types
             parsed_tuples = []
             for tuple_elements in tuples:
@@ -356,15 +700,12 @@ def parse_sql_result_string(result_string):
                         converted_tuple.append(True)
                     elif element in ['False', 'false']:
                         converted_tuple.append(False)
-                    elif element.replace('.', '').replace('-', '').isdigit():
+                    elif _PLAIN_NUMBER_RE.fullmatch(element):
                         # Numeric value
-                        try:
-                            if '.' in element:
-                                converted_tuple.append(float(element))
-                            else:
-                                converted_tuple.append(int(element))
-                        except:
-                            converted_tuple.append(element)
+                        if '.' in element:
+                            converted_tuple.append(float(element))
+                        else:
+                            converted_tuple.append(int(element))
                     else:
                         # String value
                         converted_tuple.append(element)
@@ -383,6 +724,186 @@ def parse_sql_result_string(result_string):
     return result_string
 
 
+# Column names for the 37-column agents table
+_AGENTS_COLUMNS = (
+    "ID", "UUID", "First_Name", "Last_Name", "Company", "Phone", "Email",
+    "License", "State", "Years_Experience", "Total_Sales", "Total_Value",
+    "Commission_Rate", "Address", "City", "State_Code", "Zip_Code",
+    "Languages", "Specialization", "Rating", "Bio", "Website",
+    "Personal_Info_1", "Personal_Info_2", "Active", "Hire_Date", "Last_Active",
+    "Clients_Count", "Referrals", "Marketing_Budget", "Lead_Count",
+    "Conversion_Rate", "Team_Size", "Contract_End", "CRM_System",
+    "Social_Media", "Profile_Image",
+)
+
+# Column names for the 20-column properties table
+_PROPERTIES_COLUMNS = (
+    "Property_ID", "Address", "City", "State", "Zip_Code", "Price", "Bedrooms",
+    "Bathrooms", "Square_Feet", "Lot_Size", "Year_Built", "Property_Type",
+    "Status", "Agent_ID", "Owner_ID", "Listed_Date", "Sold_Date",
+    "Days_On_Market", "Description", "Features",
+)
+
+# Generic descriptive names for medium tables (10+ columns)
+_MEDIUM_TABLE_COLUMNS = (
+    "ID", "Name", "Description", "Value_1", "Value_2", "Date_1", "Date_2",
+    "Status", "Category", "Notes",
+)
+
+# Basic names for small tables (5+ columns)
+_SMALL_TABLE_COLUMNS = (
+    "ID", "Name", "Value", "Status", "Date",
+)
+
+
+def _generic_column_names(num_cols):
+    """Return generic 'Column_N' names for a result with num_cols columns."""
+    return tuple(f"Column_{i+1}" for i in range(num_cols))
+
+
+# Name templates by minimum result width, narrowest first
+_COLUMN_TEMPLATE_WIDTHS = (5, 10, 20, 35)
+_COLUMN_TEMPLATES = (
+    _SMALL_TABLE_COLUMNS,
+    _MEDIUM_TABLE_COLUMNS,
+    _PROPERTIES_COLUMNS,
+    _AGENTS_COLUMNS,
+)
+
+
+def _columns_for(num_cols):
+    """Return column names for a result of num_cols columns.
+
+    Picks the widest template the result fits (agents, properties, medium,
+    small), truncated or padded with generic names to exactly num_cols.
+    """
+    index = bisect.bisect_right(_COLUMN_TEMPLATE_WIDTHS, num_cols) - 1
+    if index < 0:
+        return _generic_column_names(num_cols)
+    names = _COLUMN_TEMPLATES[index][:num_cols]
+    return names + _generic_column_names(num_cols)[len(names):]
+
+
+def _is_money_value(value):
+    """Whether a cell is an actual number (int, float or Decimal, not bool)."""
+    return isinstance(value, _NUMERIC_TYPES) and not isinstance(value, bool)
+
+
+def _format_currency(values):
+    """Format the numeric cells of a Series as $X,XXX.XX.
+
+    Only int, float and Decimal cells are formatted; everything else keeps
+    its string form, so numeric-looking text such as a zip code stays as is.
+    """
+    cells = values.astype(object)  # Python scalars, not numpy ones
+    is_money = cells.map(_is_money_value).astype(bool)
+    amounts = cells.where(is_money, 0).astype(float)
+    return amounts.map("${:,.2f}".format).where(is_money, cells.map(str))
+
+
+# Labels for single-value COUNT results, checked in order against the question
+_COUNT_LABELS = (
+    ("table", "Total tables in database"),
+    ("customer", "Total customers"),
+    ("order", "Total orders"),
+    ("sale", "Total sales"),
+)
+
+
+# Substring alternations searched in the lowercased question, one pass each
+# ("price"/"sale" also cover their plurals)
+_REAL_ESTATE_TERMS_RE = re.compile("price|sale|properties|agent")
+_KNOWN_TABLES_RE = re.compile("agents|properties|locations|owners|transactions")
+
+# Placeholder table for empty results; callers get a copy through
+# st.cache_data, so the shared frame is never modified
+_NO_DATA_DF = pd.DataFrame({"Result": ["No data"]})
+
+# Result column names holding money amounts (searched in the lowercased name);
+# counts, flags, ids, dates, rates and types are never money
+_CURRENCY_COLUMN_RE = re.compile("(?:price|precio|amount|value|costs?|fee|commission)$")
+_NON_CURRENCY_COLUMN_RE = re.compile("count|flag|id|date|rate|type")
+
+
+def _is_currency_column(name):
+    """Whether a result column name denotes a money amount."""
+    name = str(name).lower()
+    return (
+        _CURRENCY_COLUMN_RE.search(name) is not None
+        and _NON_CURRENCY_COLUMN_RE.search(name) is None
+    )
+
+
+def _classify_query(sql_query, user_question):
+    """Evaluate the text checks format_sql_result_to_dataframe dispatches on.
+
+    Each string is case-folded once per call and every case reads the
+    returned flags. Repeated results skip this entirely: the formatter is
+    memoized with st.cache_data.
+    """
+    question_lower = user_question.lower()
+    sql_upper = sql_query.upper()
+
+    if "average" in question_lower or "AVG" in sql_upper:
+        region_metric = "Average Revenue"
+    elif "sum" in question_lower or "total" in question_lower:
+        region_metric = "Total Revenue"
+    elif "COUNT" in sql_upper:
+        region_metric = "Count"
+    else:
+        region_metric = "Value"
+
+    return {
+        "order_value": (
+            "highest value" in question_lower
+            or "TOTALPRICE" in sql_upper
+            or "ORDER BY" in sql_upper
+        ),
+        "real_estate": _REAL_ESTATE_TERMS_RE.search(question_lower) is not None,
+        "asks_city": "city" in question_lower,
+        "asks_price": "price" in question_lower,
+        "count": (
+            "COUNT(*)" in sql_upper
+            or "count(*)" in question_lower
+            or "how many" in question_lower
+            or "quantity" in question_lower
+        ),
+        "count_label": next(
+            (label for keyword, label in _COUNT_LABELS if keyword in question_lower),
+            "Total records",
+        ),
+        "current_database": "CURRENT_DATABASE" in sql_upper,
+        "table_listing": (
+            ("INFORMATION_SCHEMA.TABLES" in sql_upper and "TABLE_NAME" in sql_upper)
+            or "SHOW TABLES" in sql_upper
+        ),
+        "region": "region" in question_lower,
+        "region_metric": region_metric,
+        "known_table": _KNOWN_TABLES_RE.search(question_lower) is not None,
+        "asks_agent": "agent" in question_lower,
+        "asks_property": "propert" in question_lower,
+    }
+
+
+def _as_row_sequences(data):
+    """Return the rows as sequences, wrapping non-tuple rows as one text cell."""
+    return [row if isinstance(row, (tuple, list)) else (str(row),) for row in data]
+
+
+def _text_frame(rows, columns):
+    """Build a DataFrame of str cells from result rows, with None shown as ''.
+
+    object dtype stops pandas from inferring numeric columns, so the single
+    astype(str) pass over the frame gives each value's own str() form.
+    """
+    frame = pd.DataFrame(rows, columns=columns, dtype=object).fillna('')
+    try:
+        return frame.astype(str)
+    except UnicodeDecodeError:
+        # Binary values that aren't UTF-8: convert cell by cell instead
+        return frame.map(str)
+
+
 def format_data_for_display(df):
     """Format DataFrame values for better visual presentation"""
     try:
@@ -399,18 +920,17 @@ def format_data_for_display(df):
                 pass
             
             elif col in ['Total_Value', 'Price', 'Commission_Rate', 'Conversion_Rate']:
-                # Format monetary and percentage values
-                for idx in df_formatted.index:
-                    val = str(df_formatted.loc[idx, col])
-                    if val.replace('.', '').replace('-', '').isdigit():
-                        try:
-                            num_val = float(val)
-                            if col in ['Total_Value', 'Price'] and num_val > 1000:
-                                df_formatted.loc[idx, col] = f"${num_val:,.2f}"
-                            elif col in ['Commission_Rate', 'Conversion_Rate'] and num_val < 100:
-                                df_formatted.loc[idx, col] = f"{num_val}%"
-                        except:
-                            pass
+                # Format monetary and percentage values; only plain decimal
+                # numbers are converted
+                text = df_formatted[col].astype(str)
+                numeric = text[text.str.fullmatch(_PLAIN_NUMBER_PATTERN)].astype(float)
+                if col in ['Total_Value', 'Price']:
+                    formatted = numeric[numeric > 1000].map("${:,.2f}".format)
+                else:
+                    formatted = numeric[numeric < 100].map("{}%".format)
+                if not formatted.empty:
+                    df_formatted[col] = df_formatted[col].astype(object)
+                    df_formatted.loc[formatted.index, col] = formatted
             
             elif col in ['Address', 'address']:
                 # Clean up address formatting
@@ -418,9 +938,9 @@ def format_data_for_display(df):
             
             elif col in ['Bio', 'Description', 'bio', 'description']:
                 # Truncate long text fields for better display
-                df_formatted[col] = df_formatted[col].apply(
-                    lambda x: x[:100] + '...' if len(str(x)) > 100 else x
-                )
+                text = df_formatted[col].astype(str)
+                is_long = text.str.len() > 100
+                df_formatted[col] = text.where(~is_long, text.str.slice(0, 100) + '...')
             
             elif col in ['Languages', 'languages', 'Specialization', 'specialization']:
                 # Format comma-separated values
@@ -434,26 +954,20 @@ def format_data_for_display(df):
 def clean_dataframe_for_streamlit(df):
     """Clean DataFrame to ensure Streamlit/PyArrow compatibility"""
     try:
-        # Make a copy to avoid modifying the original
-        df_cleaned = df.copy()
-        
-        # First apply formatting for better visual presentation
-        df_cleaned = format_data_for_display(df_cleaned)
+        # First apply formatting for better visual presentation; it works on
+        # its own copy, so the original is never modified
+        df_cleaned = format_data_for_display(df)
         
-        # Force all columns to string type to prevent PyArrow inference issues
-        for col in df_cleaned.columns:
-            # First handle null values, then convert to string
-            df_cleaned[col] = df_cleaned[col].fillna('')  # Use empty string instead of 'N/A'
-            df_cleaned[col] = df_cleaned[col].astype(str)
-            
-            # Clean up common problematic values
-            df_cleaned[col] = df_cleaned[col].replace({
-                'nan': '',
-                'NaN': '',
-                'None': '',
-                'null': '',
-                'NULL': ''
-            })
+        # Force all columns to string type to prevent PyArrow inference issues:
+        # handle null values (empty string instead of 'N/A'), convert to
+        # string, then clean up common problematic values, once for the frame
+        df_cleaned = df_cleaned.fillna('').astype(str).replace({
+            'nan': '',
+            'NaN': '',
+            'None': '',
+            'null': '',
+            'NULL': ''
+        }).astype(_DISPLAY_STRING_DTYPE)
         
         return df_cleaned
     except Exception as e:
@@ -474,17 +988,40 @@ def clean_dataframe_for_streamlit(df):
             # Last resort: return original
             return df
 
-def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
-    """Convert SQL results into a well-formatted DataFrame"""
-    from decimal import Decimal
+
+@st.cache_data(
+    max_entries=128,
+    show_spinner=False,
+    # Row lists are keyed on their repr: one C-level pass instead of
+    # Streamlit's per-element hashing, which costs more than the formatting
+    hash_funcs={list: repr, tuple: repr},
+)
+def format_sql_result_to_dataframe(data, sql_query="", user_question="", columns=None):
+    """Convert SQL results into a well-formatted DataFrame
+
+    ``columns`` are the cursor's column names when the agent has them; they
+    name the real estate result columns instead of guessing from the values.
+    Cached on (data, sql_query, user_question, columns), so re-submitted prompts whose
+    agent result is reused skip the formatting passes. Streamlit hands back a
+    copy of the cached frame on each call.
+    """
+    # Already tabular (e.g. pandas.read_sql upstream): nothing to format
+    if isinstance(data, pd.DataFrame):
+        return data
+    # Records with their own column names (e.g. DictCursor rows): use them as is
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        return clean_dataframe_for_streamlit(pd.DataFrame(data, dtype=object))
 
     # Smart formatting of SQL results
 
     try:
-        # Case 1: If it's a string, try to parse it first
-        if isinstance(data, str):
+        # Case 1: Structured rows (list or tuple) skip string parsing
+        if isinstance(data, tuple):
+            data = list(data)
+        # Otherwise, if it's a string, try to parse it first
+        elif isinstance(data, str):
             # Try to parse if it looks like SQL data
-            if data.startswith("[") or data.startswith("("):
+            if data.startswith(("[", "(")):
                 parsed_data = parse_sql_result_string(data)
                 if parsed_data != data:  # If it could be parsed
                     data = parsed_data
@@ -493,7 +1030,9 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
                     return pd.DataFrame({"Result": [data]})
             else:
                 # Check if it's a direct SQL result that looks like a query
-                if any(keyword in data.upper() for keyword in ['SELECT', 'WITH', 'FROM', 'WHERE']):
+                data_upper = data.upper()
+                sql_keywords = ['SELECT', 'WITH', 'FROM', 'WHERE']
+                if any(keyword in data_upper for keyword in sql_keywords):
                     # This is a SQL query that wasn't executed - show helpful message
                     return pd.DataFrame({
                         "Status": ["⚠️ Query Generated But Not Executed"],
@@ -505,53 +1044,66 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
 
         # Case 2: If there's no data or it's not a list
         if not isinstance(data, list) or not data:
-            return pd.DataFrame({"Result": ["No data"]})
+            return _NO_DATA_DF
+
+        # Text checks for every case below, evaluated once per call
+        query = _classify_query(sql_query, user_question)
+        # Result shape, taken from the first row (driver rows are homogeneous)
+        ncols = len(data[0]) if isinstance(data[0], (tuple, list)) else 1
 
         # Case 3: For specific high-value order queries
-        if (
-            "highest value" in user_question.lower()
-            or "totalprice" in sql_query.lower()
-            or "ORDER BY" in sql_query.upper()
-        ):
+        if query["order_value"]:
 
             # Detected as order value query
-            if len(data[0]) >= 2:
-                formatted_rows = []
-                for row in data:
-                    order_id = row[0]
-                    value = row[1]
-
-                    # Format value as currency
-                    if isinstance(value, (int, float, Decimal)):
-                        formatted_value = f"${float(value):,.2f}"
-                    else:
-                        formatted_value = str(value)
-
-                    formatted_rows.append(
-                        {"Order ID": order_id, "Total Value": formatted_value}
-                    )
-
-                df_result = pd.DataFrame(formatted_rows)
+            if ncols >= 2:
+                df_result = pd.DataFrame(
+                    [row[:2] for row in data], columns=["Order ID", "Total Value"]
+                )
+                # Format value as currency
+                df_result["Total Value"] = _format_currency(df_result["Total Value"])
                 # DataFrame created with custom formatting
                 df_result = clean_dataframe_for_streamlit(df_result)
                 return df_result
 
         # Case 4: For specific real estate queries
-        if any(term in user_question.lower() for term in ["price", "prices", "sale", "sales", "properties", "agent"]):
-            if len(data) > 0 and len(data[0]) >= 2:
+        if query["real_estate"]:
+            if columns and len(columns) == ncols:
+                # Monetary columns are picked by name, then formatted in one pass
+                currency_positions = [
+                    i for i, name in enumerate(columns) if _is_currency_column(name)
+                ]
+                if currency_positions:
+                    df_result = pd.DataFrame(data, columns=columns, dtype=object)
+                    for i in currency_positions:
+                        df_result.isetitem(i, _format_currency(df_result.iloc[:, i]))
+                    df_result = clean_dataframe_for_streamlit(df_result)
+                    return df_result
+            elif ncols >= 2:
                 # Detect if there are prices or monetary values
-                if any(col_name in str(data[0]).lower() for col_name in ["price", "sale", "commission"]):
+                first_row_text = str(data[0]).lower()
+                money_words = ["price", "sale", "commission"]
+                if any(col_name in first_row_text for col_name in money_words):
+                    asks_city = query["asks_city"]
+                    value_label = "Price" if query["asks_price"] else "Value"
                     formatted_rows = []
                     for row in data:
                         formatted_row = {}
                         for i, value in enumerate(row):
                             col_name = f"Column_{i+1}"
-                            if i == 0 and any(term in user_question.lower() for term in ["city"]):
+                            value_text = str(value).lower()
+                            if i == 0 and asks_city:
                                 col_name = "City"
-                            elif "price" in str(value).lower() or (isinstance(value, (int, float)) and value > 10000):
-                                col_name = "Price" if "price" in user_question.lower() else "Value"
-                                value = f"${float(value):,.2f}" if isinstance(value, (int, float, Decimal)) else str(value)
-                            elif "id" in str(value).lower() or (i == 0 and isinstance(value, int) and value < 10000):
+                            elif "price" in value_text or (
+                                isinstance(value, (int, float)) and value > 10000
+                            ):
+                                col_name = value_label
+                                if isinstance(value, _NUMERIC_TYPES):
+                                    value = f"${float(value):,.2f}"
+                                else:
+                                    value = str(value)
+                            elif "id" in value_text or (
+                                i == 0 and isinstance(value, int) and value < 10000
+                            ):
                                 col_name = "ID"
                             formatted_row[col_name] = value
                         formatted_rows.append(formatted_row)
@@ -560,193 +1112,90 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
                     return df_result
         
         # Case 5: For COUNT queries (how many/quantity)
-        if (
-            "COUNT(*)" in sql_query.upper()
-            or "count(*)" in user_question.lower()
-            or "how many" in user_question.lower()
-            or "quantity" in user_question.lower()
-        ):
-            if len(data) > 0 and len(data[0]) == 1:
+        if query["count"]:
+            if ncols == 1:
                 count_value = data[0][0]
-                # Determine what is being counted based on the question
-                if "table" in user_question.lower():
-                    return pd.DataFrame(
-                        [
-                            {
-                                "Description": "Total tables in database",
-                                "Count": f"{count_value:,}",
-                            }
-                        ]
-                    )
-                elif "customer" in user_question.lower():
-                    return pd.DataFrame(
-                        [
-                            {
-                                "Description": "Total customers",
-                                "Count": f"{count_value:,}",
-                            }
-                        ]
-                    )
-                elif (
-                    "order" in user_question.lower()
-                ):
-                    return pd.DataFrame(
-                        [
-                            {
-                                "Description": "Total orders",
-                                "Count": f"{count_value:,}",
-                            }
-                        ]
-                    )
-                elif "sale" in user_question.lower():
-                    return pd.DataFrame(
-                        [
-                            {
-                                "Description": "Total sales",
-                                "Count": f"{count_value:,}",
-                            }
-                        ]
-                    )
-                else:
-                    return pd.DataFrame(
-                        [
-                            {
-                                "Description": "Total records",
-                                "Count": f"{count_value:,}",
-                            }
-                        ]
-                    )
+                # Label depends on what the question counts
+                return pd.DataFrame.from_records(
+                    [(query["count_label"], f"{count_value:,}")],
+                    columns=["Description", "Count"],
+                )
 
         # Case 6: For CURRENT_DATABASE
-        if "CURRENT_DATABASE" in sql_query.upper():
+        if query["current_database"]:
             return pd.DataFrame(data, columns=["Database"])
 
         # Case 7: For metadata queries (direct table listing)
-        if ("INFORMATION_SCHEMA.TABLES" in sql_query.upper() and "TABLE_NAME" in sql_query.upper()) or "SHOW TABLES" in sql_query.upper():
-            if len(data) > 0:
-                # Check if it's the clean metadata query format (TABLE_NAME, TABLE_TYPE)
-                if len(data[0]) == 2:
-                    # Clean metadata format: just table name and type
-                    table_list = []
-                    for i, row in enumerate(data, 1):
-                        table_name = row[0]  # TABLE_NAME
-                        table_type = row[1]  # TABLE_TYPE
-                        table_list.append({
-                            "#": i,
-                            "Table": table_name,
-                            "Type": table_type
-                        })
-                    df_result = pd.DataFrame(table_list)
-                    df_result = clean_dataframe_for_streamlit(df_result)
-                    return df_result
-                elif len(data[0]) >= 2:
-                    # Legacy SHOW TABLES format with lots of columns
-                    table_names = []
-                    for i, row in enumerate(data, 1):
-                        table_name = row[1]  # Table name is in the second column for SHOW TABLES
-                        table_names.append({
-                            "#": i,
-                            "Table": table_name
-                        })
-                    df_result = pd.DataFrame(table_names)
-                    df_result = clean_dataframe_for_streamlit(df_result)
-                    return df_result
+        if query["table_listing"]:
+            # Check if it's the clean metadata query format (TABLE_NAME, TABLE_TYPE)
+            if ncols == 2:
+                # Clean metadata format: just table name and type
+                df_result = pd.DataFrame.from_records(
+                    [(i, row[0], row[1]) for i, row in enumerate(data, 1)],
+                    columns=["#", "Table", "Type"],
+                )
+                df_result = clean_dataframe_for_streamlit(df_result)
+                return df_result
+            elif ncols >= 2:
+                # Legacy SHOW TABLES format with lots of columns; the table
+                # name is in the second column
+                df_result = pd.DataFrame.from_records(
+                    [(i, row[1]) for i, row in enumerate(data, 1)],
+                    columns=["#", "Table"],
+                )
+                df_result = clean_dataframe_for_streamlit(df_result)
+                return df_result
 
         # Case 8: For region-based queries (average, sum, etc.)
-        if (
-            "region" in user_question.lower()
-            or "regions" in user_question.lower()
-        ) and len(data) > 0 and len(data[0]) == 2:
-            # Detect if it's average, sum, total, etc.
-            if "average" in user_question.lower() or "avg" in sql_query.lower():
-                metric_name = "Average Revenue"
-            elif "sum" in user_question.lower() or "total" in user_question.lower():
-                metric_name = "Total Revenue"
-            elif "count" in sql_query.lower():
-                metric_name = "Count"
-            else:
-                metric_name = "Value"
-            
-            formatted_rows = []
-            for row in data:
-                region = row[0]
-                value = row[1]
-                
-                # Format value as currency if numeric
-                if isinstance(value, (int, float, Decimal)):
-                    value_formatted = f"${float(value):,.2f}"
-                else:
-                    value_formatted = str(value)
-                
-                formatted_rows.append({
-                    "Region": region,
-                    metric_name: value_formatted
-                })
-            
-            df_result = pd.DataFrame(formatted_rows)
+        if query["region"] and ncols == 2:
+            # Metric label reflects average, sum, total, etc.
+            metric_name = query["region_metric"]
+            df_result = pd.DataFrame(data, columns=["Region", metric_name])
+            # Format value as currency if numeric
+            df_result[metric_name] = _format_currency(df_result[metric_name])
             df_result = clean_dataframe_for_streamlit(df_result)
             return df_result
 
         # Case 9: For simple table queries (like "first five rows from agents")
-        if any(table_name in user_question.lower() for table_name in ["agents", "properties", "locations", "owners", "transactions"]):
+        if query["known_table"]:
             try:
                 # Create DataFrame with proper handling for mixed types
                 # First, ensure all data is in consistent tuple format
-                cleaned_data = []
-                for row in data:
-                    if isinstance(row, (tuple, list)):
-                        # Convert all elements to strings to avoid type issues
-                        cleaned_row = [str(item) if item is not None else '' for item in row]
-                        cleaned_data.append(cleaned_row)
-                    else:
-                        cleaned_data.append([str(row)])
+                cleaned_data = _as_row_sequences(data)
                 
                 # Create DataFrame with meaningful column names for known tables
                 if cleaned_data:
                     num_cols = len(cleaned_data[0]) if cleaned_data[0] else 1
                     
+                    # The cursor's column names win when the agent provides them
+                    if columns and len(columns) == num_cols:
+                        column_names = list(columns)
+
                     # Define meaningful column names for the agents table (37 columns)
-                    if ("agent" in user_question.lower() and num_cols >= 35) or num_cols == 37:
-                        column_names = [
-                            "ID", "UUID", "First_Name", "Last_Name", "Company", "Phone", "Email", 
-                            "License", "State", "Years_Experience", "Total_Sales", "Total_Value", 
-                            "Commission_Rate", "Address", "City", "State_Code", "Zip_Code", 
-                            "Languages", "Specialization", "Rating", "Bio", "Website", 
-                            "Personal_Info_1", "Personal_Info_2", "Active", "Hire_Date", 
-                            "Last_Active", "Clients_Count", "Referrals", "Marketing_Budget", 
-                            "Lead_Count", "Conversion_Rate", "Team_Size", "Contract_End", 
-                            "CRM_System", "Social_Media", "Profile_Image"
-                        ]
+                    elif (query["asks_agent"] and num_cols >= 35) or num_cols == 37:
                         # Truncate or extend column names to match actual data
-                        if len(column_names) > num_cols:
-                            column_names = column_names[:num_cols]
-                        elif len(column_names) < num_cols:
-                            column_names.extend([f"Column_{i}" for i in range(len(column_names), num_cols)])
+                        column_names = list(_AGENTS_COLUMNS[:num_cols]) + [
+                            f"Column_{i}" for i in range(len(_AGENTS_COLUMNS), num_cols)
+                        ]
                     
                     # Define meaningful column names for properties table (if applicable)
-                    elif "propert" in user_question.lower() and num_cols >= 20:
-                        column_names = [
-                            "Property_ID", "Address", "City", "State", "Zip_Code", "Price", 
-                            "Bedrooms", "Bathrooms", "Square_Feet", "Lot_Size", "Year_Built", 
-                            "Property_Type", "Status", "Agent_ID", "Owner_ID", "Listed_Date", 
-                            "Sold_Date", "Days_On_Market", "Description", "Features"
+                    elif query["asks_property"] and num_cols >= 20:
+                        # Truncate or extend column names to match actual data
+                        column_names = list(_PROPERTIES_COLUMNS[:num_cols]) + [
+                            f"Column_{i}"
+                            for i in range(len(_PROPERTIES_COLUMNS), num_cols)
                         ]
-                        # Adjust column names to match data
-                        if len(column_names) > num_cols:
-                            column_names = column_names[:num_cols]
-                        elif len(column_names) < num_cols:
-                            column_names.extend([f"Column_{i}" for i in range(len(column_names), num_cols)])
                     
                     else:
                         # Generic column names for unknown structures
-                        column_names = [f"Column_{i+1}" for i in range(num_cols)]
+                        column_names = list(_generic_column_names(num_cols))
                     
-                    df = pd.DataFrame(cleaned_data, columns=column_names)
+                    df = _text_frame(cleaned_data, column_names)
                     # Clean the DataFrame to ensure Streamlit compatibility
                     df = clean_dataframe_for_streamlit(df)
                     return df
                 else:
-                    return pd.DataFrame({"Result": ["No data"]})
+                    return _NO_DATA_DF
             except Exception as e:
                 # Fallback to string conversion
                 try:
@@ -754,7 +1203,7 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
                     string_data = []
                     for i, row in enumerate(data):
                         string_data.append({"Row": i+1, "Data": str(row)})
-                    df = pd.DataFrame(string_data)
+                    df = pd.DataFrame(string_data, dtype=object)
                     df = clean_dataframe_for_streamlit(df)
                     return df
                 except:
@@ -763,56 +1212,18 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
         # Case 10: Default - create DataFrame more robustly
         try:
             # First attempt: clean the data before creating DataFrame
-            if len(data) > 0 and isinstance(data[0], (tuple, list)):
+            if isinstance(data[0], (tuple, list)):
                 # Clean complex tuple data
-                cleaned_data = []
-                for row in data:
-                    if isinstance(row, (tuple, list)):
-                        # Convert all elements to strings to avoid type issues
-                        cleaned_row = [str(item) if item is not None else '' for item in row]
-                        cleaned_data.append(cleaned_row)
-                    else:
-                        cleaned_data.append([str(row)])
+                cleaned_data = _as_row_sequences(data)
                 
-                # Create DataFrame with meaningful column names based on size
+                # Use the cursor's column names, or guess them based on size
                 num_cols = len(cleaned_data[0]) if cleaned_data else 1
-                
-                # Smart column naming based on common database result patterns
-                if num_cols >= 35 or num_cols == 37:  # Likely agents table
-                    column_names = [
-                        "ID", "UUID", "First_Name", "Last_Name", "Company", "Phone", "Email", 
-                        "License", "State", "Years_Experience", "Total_Sales", "Total_Value", 
-                        "Commission_Rate", "Address", "City", "State_Code", "Zip_Code", 
-                        "Languages", "Specialization", "Rating", "Bio", "Website", 
-                        "Personal_Info_1", "Personal_Info_2", "Active", "Hire_Date", 
-                        "Last_Active", "Clients_Count", "Referrals", "Marketing_Budget", 
-                        "Lead_Count", "Conversion_Rate", "Team_Size", "Contract_End", 
-                        "CRM_System", "Social_Media", "Profile_Image"
-                    ]
-                elif num_cols >= 20:  # Likely properties table
-                    column_names = [
-                        "Property_ID", "Address", "City", "State", "Zip_Code", "Price", 
-                        "Bedrooms", "Bathrooms", "Square_Feet", "Lot_Size", "Year_Built", 
-                        "Property_Type", "Status", "Agent_ID", "Owner_ID", "Listed_Date", 
-                        "Sold_Date", "Days_On_Market", "Description", "Features"
-                    ]
-                elif num_cols >= 10:  # Medium table - generic descriptive names
-                    column_names = [
-                        "ID", "Name", "Description", "Value_1", "Value_2", "Date_1", 
-                        "Date_2", "Status", "Category", "Notes"
-                    ]
-                elif num_cols >= 5:  # Small table - basic names
-                    column_names = ["ID", "Name", "Value", "Status", "Date"]
+                if columns and len(columns) == num_cols:
+                    column_names = list(columns)
                 else:
-                    column_names = ["Column_1", "Column_2", "Column_3", "Column_4"][:num_cols]
-                
-                # Adjust column names to match actual data length
-                if len(column_names) > num_cols:
-                    column_names = column_names[:num_cols]
-                elif len(column_names) < num_cols:
-                    column_names.extend([f"Column_{i+1}" for i in range(len(column_names), num_cols)])
+                    column_names = list(_columns_for(num_cols))
                 
-                df = pd.DataFrame(cleaned_data, columns=column_names)
+                df = _text_frame(cleaned_data, column_names)
                 # Clean the DataFrame to ensure Streamlit compatibility
                 df = clean_dataframe_for_streamlit(df)
                 return df
@@ -827,49 +1238,27 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
             try:
                 # Convert everything to string first
                 if isinstance(data, list) and len(data) > 0:
-                    string_data = []
-                    for i, row in enumerate(data):
-                        if isinstance(row, (tuple, list)):
-                            string_row = [str(item) if item is not None else '' for item in row]
-                            string_data.append(string_row)
-                        else:
-                            string_data.append([str(row)])
+                    string_data = _as_row_sequences(data)
                     
                     # Create with smart column names based on data structure
-                    num_cols = len(string_data[0]) if string_data else 1
+                    num_cols = len(string_data[0])
                     
-                    # Use the same smart naming logic as above
-                    if num_cols >= 35 or num_cols == 37:  # Likely agents table
-                        column_names = [
-                            "ID", "UUID", "First_Name", "Last_Name", "Company", "Phone", "Email", 
-                            "License", "State", "Years_Experience", "Total_Sales", "Total_Value", 
-                            "Commission_Rate", "Address", "City", "State_Code", "Zip_Code", 
-                            "Languages", "Specialization", "Rating", "Bio", "Website", 
-                            "Personal_Info_1", "Personal_Info_2", "Active", "Hire_Date", 
-                            "Last_Active", "Clients_Count", "Referrals", "Marketing_Budget", 
-                            "Lead_Count", "Conversion_Rate", "Team_Size", "Contract_End", 
-                            "CRM_System", "Social_Media", "Profile_Image"
-                        ][:num_cols]  # Truncate to actual size
-                    elif num_cols >= 20:  # Likely properties table
-                        column_names = [
-                            "Property_ID", "Address", "City", "State", "Zip_Code", "Price", 
-                            "Bedrooms", "Bathrooms", "Square_Feet", "Lot_Size", "Year_Built", 
-                            "Property_Type", "Status", "Agent_ID", "Owner_ID", "Listed_Date", 
-                            "Sold_Date", "Days_On_Market", "Description", "Features"
-                        ][:num_cols]  # Truncate to actual size
+                    # Use the same naming logic as above
+                    if columns and len(columns) == num_cols:
+                        column_names = list(columns)
                     else:
-                        column_names = [f"Column_{i+1}" for i in range(num_cols)]
-                    
-                    # Extend if needed
-                    if len(column_names) < num_cols:
-                        column_names.extend([f"Column_{i+1}" for i in range(len(column_names), num_cols)])
+                        column_names = list(_columns_for(num_cols))
                     
-                    df = pd.DataFrame(string_data, columns=column_names)
+                    df = _text_frame(string_data, column_names)
                     df = clean_dataframe_for_streamlit(df)
                     return df
                 else:
                     # Data in unexpected format
-                    df = pd.DataFrame({"Result": [str(data)] if not isinstance(data, list) else [str(item) for item in data]})
+                    if isinstance(data, list):
+                        results = [str(item) for item in data]
+                    else:
+                        results = [str(data)]
+                    df = pd.DataFrame({"Result": results}, dtype=object)
                     return df
             except Exception:
                 # Last resort: convert everything to string
@@ -882,23 +1271,19 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
             if isinstance(data, list) and len(data) > 0:
                 if isinstance(data[0], (tuple, list)):
                     # List of tuples/lists - convert all to strings
-                    string_data = []
-                    for row in data:
-                        if isinstance(row, (tuple, list)):
-                            string_row = [str(item) if item is not None else '' for item in row]
-                            string_data.append(string_row)
-                        else:
-                            string_data.append([str(row)])
+                    string_data = _as_row_sequences(data)
                     
                     # Create with generic column names
-                    num_cols = len(string_data[0]) if string_data else 1
+                    num_cols = len(string_data[0])
                     column_names = [f"Column_{i}" for i in range(num_cols)]
-                    df = pd.DataFrame(string_data, columns=column_names)
+                    df = _text_frame(string_data, column_names)
                     df = clean_dataframe_for_streamlit(df)
                     return df
                 else:
                     # Simple list
-                    df = pd.DataFrame({"Result": [str(item) for item in data]})
+                    df = pd.DataFrame(
+                        {"Result": [str(item) for item in data]}, dtype=object
+                    )
                     df = clean_dataframe_for_streamlit(df)
                     return df
             else:
@@ -916,67 +1301,176 @@ def format_sql_result_to_dataframe(data, sql_query="", user_question=""):
 # ========================
 
 
+def _render_dataframe(df, num_rows, data_key=None):
+    """Render a result table, sending only the first page of large results.
+
+    df holds at least the first page. For large results, data_key names the
+    full DataFrame in result_cache and a toggle renders every row on demand,
+    as long as that frame hasn't been evicted.
+    """
+    if num_rows <= DATAFRAME_PAGE_ROWS:
+        st.dataframe(df, width='stretch', hide_index=True)
+        return
+
+    full_df = st.session_state.result_cache.get(data_key)
+    if full_df is not None and st.toggle(
+        f"Show all {num_rows:,} rows", key=f"show_all_{data_key}"
+    ):
+        st.dataframe(full_df, width='stretch', hide_index=True)
+    else:
+        st.dataframe(df.head(DATAFRAME_PAGE_ROWS), width='stretch', hide_index=True)
+        st.caption(f"Showing first {DATAFRAME_PAGE_ROWS:,} of {num_rows:,} rows")
+
+
 def _render_single_message(message):
     """Render a single message from history."""
     with st.chat_message(message["role"]):
-        is_assistant_with_data = message["role"] == "assistant" and "data" in message
+        is_assistant_with_data = (
+            message["role"] == "assistant" and message.get("data") is not None
+        )
         if not is_assistant_with_data:
             st.write(message["content"])
             return
 
-        st.write(message["content"])
-        if not message["data"].empty:
-            st.dataframe(message["data"], width='stretch')
+        num_rows = message.get("num_rows")
+        if num_rows is None:
             num_rows = len(message["data"])
-            st.caption(
-                f"📊 {num_rows} record{'s' if num_rows != 1 else ''} shown"
-            )
+        if not num_rows:
+            st.write(message["content"])
+            return
+
+        # Content and record count in one element, then the table
+        st.markdown(
+            f"{message['content']}\n\n"
+            f"📊 {num_rows} record{'s' if num_rows != 1 else ''} shown"
+        )
+        _render_dataframe(message["data"], num_rows, message.get("data_key"))
 
 
+@st.fragment
 def display_chat_messages():
-    """Display chat message history with tables and counters."""
+    """Display chat message history with tables and counters.
+
+    Runs as a fragment so reruns scoped to it don't re-execute the rest
+    of the page.
+    """
     st.header("💬 Chat with your Database")
 
-    # Show message history
-    for message in st.session_state.messages:
+    # Show only the most recent messages; older ones (and their tables) are
+    # rendered on request. The deque keeps only the last MAX_CHAT_MESSAGES.
+    messages = st.session_state.messages
+    hidden = len(messages) - st.session_state.visible_msgs
+    if hidden > 0:
+        st.button(
+            f"⬆️ Show older messages ({hidden} hidden)",
+            on_click=_show_older_messages,
+        )
+    elif len(messages) == MAX_CHAT_MESSAGES:
+        st.caption(f"Showing the most recent {MAX_CHAT_MESSAGES} messages.")
+    for message in itertools.islice(messages, max(hidden, 0), None):
         _render_single_message(message)
 
 
+def _show_older_messages():
+    """Reveal the next CHAT_PAGE_MESSAGES older messages in the chat."""
+    st.session_state.visible_msgs += CHAT_PAGE_MESSAGES
+
+
 def _append_assistant_message(content, df=None):
-    """Add an assistant message to history with optional DataFrame."""
-    st.session_state.messages.append({
+    """Add an assistant message to history with optional DataFrame.
+
+    The row count is stored with the message so history reruns don't
+    have to ask pandas for it again. Large results keep only their first
+    page in the message; the full frame goes to result_cache under
+    "data_key", which holds the last MAX_STORED_RESULTS of them.
+
+    Text-only replies store None as their data instead of an empty frame.
+
+    Returns the message added.
+    """
+    message = {
         "role": "assistant",
         "content": content,
-        "data": df if df is not None else pd.DataFrame(),
-    })
+        "data": df,
+        "num_rows": 0 if df is None else len(df),
+    }
+    if message["num_rows"] > DATAFRAME_PAGE_ROWS:
+        data_key = uuid.uuid4().hex
+        result_cache = st.session_state.result_cache
+        result_cache[data_key] = df
+        if len(result_cache) > MAX_STORED_RESULTS:
+            result_cache.popitem(last=False)
+        message["data"] = df.head(DATAFRAME_PAGE_ROWS)
+        message["data_key"] = data_key
+    st.session_state.messages.append(message)
+    return message
 
 
 def _render_successful_result(result, prompt):
     """Render a successful agent result and update history."""
     response_content = "Query executed successfully:"
-    st.write(response_content)
 
     if not result.get("result"):
+        st.write(response_content)
         st.write("No results found.")
         _append_assistant_message("No results found.")
         return
 
     try:
         df = format_sql_result_to_dataframe(
-            result["result"], result.get("sql_query", ""), prompt
+            result["result"], result.get("sql_query", ""), prompt,
+            result.get("columns"),
         )
-        st.dataframe(df, width='stretch')
-        num_rows = len(df)
-        st.caption(
+        message = _append_assistant_message(response_content, df)
+        num_rows = message["num_rows"]
+        # Content and record count in one element, then the table
+        st.markdown(
+            f"{response_content}\n\n"
             f"📊 {num_rows} record{'s' if num_rows != 1 else ''} found"
         )
-        _append_assistant_message(response_content, df)
+        _render_dataframe(message["data"], num_rows, message.get("data_key"))
     except Exception:
         result_text = str(result.get("result"))
+        st.write(response_content)
         st.code(result_text)
         _append_assistant_message(f"{response_content}\n{result_text}")
 
 
+def _process_query_cached(prompt):
+    """Run the prompt through the agent, reusing recent successful results.
+
+    Prompts are keyed case- and whitespace-insensitively; entries expire after
+    config.QUERY_RESULT_TTL seconds (0 disables the cache) and the least
+    recently used one is evicted past QUERY_CACHE_MAX_ENTRIES. Like the
+    agent's own result cache, only successful results of deterministic SQL
+    are kept.
+    """
+    agent = st.session_state.agent
+    cache = st.session_state.query_cache
+    key = " ".join(prompt.lower().split())
+    now = time.time()
+
+    cached = cache.get(key)
+    if cached is not None:
+        timestamp, result = cached
+        if now - timestamp < config.QUERY_RESULT_TTL:
+            cache.move_to_end(key)
+            agent.log_step("💾 Cache Hit", "Reusing the result of an identical prompt")
+            return result
+        del cache[key]
+
+    result = agent.process_query(prompt)
+    if (
+        isinstance(result, dict)
+        and result.get("success")
+        and agent._is_cacheable_sql(result.get("sql_query") or "")
+    ):
+        cache[key] = (now, result)
+        if len(cache) > QUERY_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+    return result
+
+
 def _render_error_result(result):
     """Render an agent error and update history."""
     if isinstance(result, dict) and result.get('user_friendly'):
@@ -1040,15 +1534,22 @@ def process_user_input(prompt):
             return
 
         with st.spinner("Processing query..."):
-            result = st.session_state.agent.process_query(prompt)
+            result = _process_query_cached(prompt)
         
         # Manejo especial: SHOW TABLES → listar nombres, no dataframe crudo
         sql_q = (result.get("sql_query") or "").upper()
         if "SHOW TABLES" in sql_q and isinstance(result.get("result"), list):
-            tables = [row[1] for row in result["result"] if isinstance(row, (list, tuple)) and len(row) > 1]
+            rows = result["result"]
+            # Driver rows share one shape, so check the first row only
+            has_names = (
+                bool(rows)
+                and isinstance(rows[0], (list, tuple))
+                and len(rows[0]) > 1
+            )
+            tables = [row[1] for row in rows] if has_names else []
             st.write("Tables:")
-            for t in tables:
-                st.write(f"• {t}")
+            # One markdown element for the whole list instead of one per table
+            st.markdown("\n\n".join(f"• {t}" for t in tables))
             _append_assistant_message("Query executed successfully:", pd.DataFrame({"Tables": tables}))
             return
 
@@ -1064,10 +1565,17 @@ def display_logs_panel():
     st.header("📋 Process Logs")
 
     if st.session_state.processing_logs:
-        # Show logs in reverse order (most recent first)
-        for log in reversed(st.session_state.processing_logs[-10:]):  # Last 10 logs
-            with st.expander(f"⏰ {log['timestamp']} - {log['step']}", expanded=False):
-                st.code(log["content"])
+        # Show logs in reverse order (most recent first); the deque keeps only
+        # the last MAX_PROCESSING_LOGS entries. One st.code element inside a
+        # single expander: it renders the text verbatim, so backticks in the
+        # logged SQL or errors cannot break out of the block.
+        logs = st.session_state.processing_logs
+        body = "\n\n".join(
+            f"⏰ {log['timestamp']} - {log['step']}\n{log['content']}"
+            for log in reversed(logs)
+        )
+        with st.expander(f"Recent logs (last {len(logs)})", expanded=False):
+            st.code(body, language=None)
     else:
         st.info("No logs available. Make a query to see the process.")
 
@@ -1092,24 +1600,26 @@ def main():
     # Set up connection if it doesn't exist
     if not st.session_state.db_connection:
         with st.spinner("Connecting to Snowflake..."):
-            db_conn = SnowflakeConnection()
-            if db_conn.connect():
+            db_conn = _get_db_connection()
+            if db_conn is not None:
                 st.session_state.db_connection = db_conn
 
                 # Initialize agent (auto-detects LLM provider)
                 google_api_key = os.getenv("GOOGLE_API_KEY")
                 groq_api_key = os.getenv("GROQ_API_KEY")
                 try:
-                    st.session_state.agent = SnowflakeNLPAgent(
+                    st.session_state.agent = _get_agent(
                         db_conn.get_connection_string(),
-                        groq_api_key=groq_api_key,
-                        google_api_key=google_api_key,
+                        groq_api_key,
+                        google_api_key,
                     )
                     st.success("✅ Connection established successfully!")
                 except Exception as e:
                     st.error(f"❌ Error initializing LLM: {e}")
                     st.stop()
             else:
+                # Don't keep the failed attempt cached so the next rerun retries
+                _get_db_connection.clear()
                 st.error(
                     "❌ Could not connect to Snowflake. Check your configuration."
                 )
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the parsing of SQL result strings into rows (no Snowflake connection).
+
+Covers the single-pass scanner, the json path for numbers-only results and
+the regex + ast.literal_eval and tuple-splitting fallbacks.
+"""
+
+import ast
+
+import pytest
+
+from streamlit_app import (
+    _DRIVER_LITERAL_RE,
+    _fast_parse_rows,
+    _parse_numeric_rows_json,
+    _replace_driver_literal,
+    _split_fallback_tuples,
+    parse_sql_result_string,
+)
+
+# Driver output the scanner must read exactly like ast.literal_eval does
+DRIVER_RESULTS = [
+    "[(1, Decimal('12.50'), None)]",
+    "[(1, datetime.date(2024, 1, 5), datetime.datetime(2024, 1, 5, 10, 30))]",
+    "[(1, 'it\\'s'), (2, \"say \\\"hi\\\"\")]",
+    "[(1,)]",
+    "[(-1.5, 2e3, True, False)]",
+    "(1, 'a')",
+    "[]",
+]
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Decimal, None, date and datetime values
+    (
+        "[(1, Decimal('12.50'), None, datetime.date(2024, 1, 5))]",
+        [(1, 12.5, "None", "2024-1-5")],
+    ),
+    (
+        "[(1, datetime.datetime(2024, 1, 5, 10, 30))]",
+        [(1, "datetime(2024, 1, 5, 10, 30)")],
+    ),
+    # Escaped quotes inside strings
+    ("[(1, 'it\\'s'), (2, \"say \\\"hi\\\"\")]", [(1, "it's"), (2, 'say "hi"')]),
+    # Single-element tuple and a bare tuple
+    ("[(1,)]", [(1,)]),
+    ("(1, 'a')", [(1, "a")]),
+    # Numbers only (json path)
+    ("[(1, 2.5), (3, -4)]", [(1, 2.5), (3, -4)]),
+    ("[]", []),
+])
+def test_parse_sql_result_string(text, expected):
+    """Driver result strings come back as a list of typed tuples."""
+    assert parse_sql_result_string(text) == expected
+
+
+@pytest.mark.parametrize("text", DRIVER_RESULTS)
+def test_fast_parse_matches_literal_eval(text):
+    """The single-pass scanner agrees with the regex + ast.literal_eval path."""
+    rewritten = _DRIVER_LITERAL_RE.sub(_replace_driver_literal, text)
+    expected = ast.literal_eval(rewritten if text.startswith("[") else f"[{rewritten}]")
+    assert _fast_parse_rows(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Unknown literals: the scanner and literal_eval both give up
+    ("[(1, f(g(2))), (2, x)]", [(1, "f(g(2))"), (2, "x")]),
+    # Unquoted apostrophe
+    ("[(1, it's), (2, b)]", [(1, "it's"), (2, "b")]),
+    # Quote that is never closed
+    ("[(1, 'unterminated), (2, y)]", [(1, "unterminated"), (2, "y")]),
+])
+def test_fallback_keeps_every_row(text, expected):
+    """Payloads ast.literal_eval rejects still yield one tuple per row."""
+    with pytest.raises(ValueError):
+        _fast_parse_rows(text)
+    assert parse_sql_result_string(text) == expected
+
+
+def test_split_fallback_tuples():
+    """Commas inside quotes don't split; an unclosed quote returns None."""
+    tuples = _split_fallback_tuples("(1, 'a, b'), (2, c)")
+    assert tuples == [["1", "'a, b'"], ["2", "c"]]
+    assert _split_fallback_tuples("(1, 'x), (2, y)") is None
+
+
+def test_parse_numeric_rows_json():
+    """Flat numeric rows parse with json; nested tuples are left to the scanner."""
+    assert _parse_numeric_rows_json("[(1, 2.5), (3,)]") == [(1, 2.5), (3,)]
+    assert _parse_numeric_rows_json("[(1, (2,))]") is None
+
+
+@pytest.mark.parametrize("value", ["plain text", "", None])
+def test_non_result_input_is_returned_as_is(value):
+    """Anything that isn't a result string passes through unchanged."""
+    assert parse_sql_result_string(value) == value
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
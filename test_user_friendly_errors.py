@@ -1,77 +1,128 @@
 #!/usr/bin/env python3
 """
 Test script to verify user-friendly error handling works correctly.
+
+Run with pytest (or directly, which invokes pytest on this file).
 """
 
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
 from dotenv import load_dotenv
 from src.database.snowflake_conn import snowflake_conn
 from src.agent.nlp_agent import SnowflakeNLPAgent
+from src.utils.config import config
+
+load_dotenv()
+
+# Set VERBOSE_TESTS to print the full result of each query
+VERBOSE = bool(os.getenv("VERBOSE_TESTS"))
+
+# Fields every user-friendly error result must carry
+EXPECTED_ERROR_FIELDS = {"success": False, "user_friendly": True}
+
+
+@contextmanager
+def force_provider(name):
+    """Temporarily force an LLM provider, restoring the settings on exit.
+
+    config reads the environment once at import, so its LLM_PROVIDER is
+    switched along with the environment variables.
+    """
+    saved_env = {
+        key: os.environ.get(key) for key in ("OLLAMA_BASE_URL", "LLM_PROVIDER")
+    }
+    saved_provider = config.LLM_PROVIDER
+    os.environ.pop("OLLAMA_BASE_URL", None)  # Remove Ollama config
+    os.environ["LLM_PROVIDER"] = name
+    config.LLM_PROVIDER = name
+    try:
+        yield
+    finally:
+        config.LLM_PROVIDER = saved_provider
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+@pytest.fixture(scope="session")
+def sf_conn():
+    """Connect to Snowflake once for the whole test session."""
+    if not snowflake_conn.connect():
+        pytest.skip("Cannot connect to Snowflake")
+    yield snowflake_conn
+    snowflake_conn.disconnect()
+
 
-def test_user_friendly_errors():
+@pytest.fixture(scope="session")
+def agent(sf_conn):
+    """Agent on the shared connection, created once with Gemini forced."""
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        pytest.skip("GOOGLE_API_KEY is not set")
+    with force_provider("gemini"):
+        return SnowflakeNLPAgent(
+            sf_conn.get_connection_string(), google_api_key=google_api_key
+        )
+
+
+# Start of the message _handle_sql_error gives SQL compilation errors
+COMPILATION_ERROR_TEXT = "❌ There was an error in the SQL query."
+
+
+@pytest.mark.parametrize("sql, expected_message", [
+    # Missing table: the message names it
+    ("SELECT * FROM __does_not_exist__", "'__does_not_exist__' doesn't exist"),
+    # Missing column: reported as a compilation error
+    (
+        "SELECT __no_such_column__ FROM INFORMATION_SCHEMA.TABLES",
+        COMPILATION_ERROR_TEXT,
+    ),
+    # Missing object in a SHOW command
+    ("SHOW COLUMNS IN TABLE __ghost__", "doesn't exist"),
+    # Syntax error
+    ("SELECT FROM WHERE", COMPILATION_ERROR_TEXT),
+])
+def test_user_friendly_error_for_bad_sql(agent, sql, expected_message):
+    """Failing SQL comes back as a user-friendly error (SQL given, no LLM call)."""
+    result = agent.process_query(sql_override=sql)
+
+    actual = {key: result.get(key) for key in EXPECTED_ERROR_FIELDS}
+    assert actual == EXPECTED_ERROR_FIELDS, result
+    assert expected_message in result["error"], result
+
+
+@pytest.mark.slow
+def test_user_friendly_errors(agent):
     """Test user-friendly error messages."""
-    print("🧪 TESTING USER-FRIENDLY ERROR MESSAGES")
-    print("=" * 50)
+    # Test case 1: Query that should cause a "table does not exist" error
+    test_query = "give me the list of owners, the names"
     
-    if not snowflake_conn.connect():
-        print("❌ Cannot connect to Snowflake")
-        return False
+    result = agent.process_query(test_query)
     
-    try:
-        conn_str = snowflake_conn.get_connection_string()
-        import os
-        # Force use of Gemini by temporarily disabling Ollama
-        original_ollama = os.environ.get('OLLAMA_BASE_URL')
-        os.environ.pop('OLLAMA_BASE_URL', None)  # Remove Ollama config
-        os.environ['LLM_PROVIDER'] = 'gemini'  # Force Gemini
-        
-        google_api_key = os.getenv("GOOGLE_API_KEY")
-        agent = SnowflakeNLPAgent(conn_str, google_api_key=google_api_key)
-        
-        # Restore original config after agent creation
-        if original_ollama:
-            os.environ['OLLAMA_BASE_URL'] = original_ollama
-        
-        # Test case 1: Query that should cause a "table does not exist" error
-        test_query = "give me the list of owners, the names"
+    if VERBOSE:
+        print("🧪 TESTING USER-FRIENDLY ERROR MESSAGES")
         print(f"🎯 Testing query: '{test_query}'")
-        
-        result = agent.process_query(test_query)
-        
         print(f"Success: {result.get('success')}")
         print(f"User Friendly: {result.get('user_friendly')}")
         print(f"Error Message: {result.get('error', 'N/A')}")
-        print(f"Technical Error: {result.get('technical_error', 'N/A')[:100]}...")
-        
-        if not result.get('success') and result.get('user_friendly'):
-            print("✅ User-friendly error handling is working!")
-            return True
-        else:
-            print("❌ User-friendly error handling failed!")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Test failed with exception: {e}")
-        return False
-    finally:
-        snowflake_conn.disconnect()
+        print(f"Technical Error: {str(result.get('technical_error', 'N/A'))[:100]}...")
+    
+    actual = {key: result.get(key) for key in EXPECTED_ERROR_FIELDS}
+    assert actual == EXPECTED_ERROR_FIELDS, result
+
 
 if __name__ == "__main__":
-    load_dotenv()
-    
     print("🔍 USER-FRIENDLY ERROR TESTING")
     print("=" * 60)
     
-    success = test_user_friendly_errors()
-    
-    print("\n" + "=" * 60)
-    if success:
-        print("🎉 USER-FRIENDLY ERROR HANDLING: ✅ WORKING!")
-        print("✅ Error messages are now user-friendly")
-        print("✅ Technical details are available for debugging")
-        print("\n🚀 Ready to test in web interface!")
-    else:
-        print("❌ USER-FRIENDLY ERROR HANDLING: ❌ NEEDS FIXING!")
+    exit_code = pytest.main([__file__, "-s"])
     
     print("\n💡 To test in web interface:")
     print("   streamlit run streamlit_app.py --server.port 8501")
-    print("   Try: 'give me the list of owners, the names'")
\ No newline at end of file
+    print("   Try: 'give me the list of owners, the names'")
+    sys.exit(exit_code)